@@ -0,0 +1,179 @@
+"""
+Benchmarks of webtest itself.
+
+Run them with ``python -m benchmarks`` from a checkout. The benchmarks are
+registered with :func:`benchmark` in :mod:`benchmarks.suite`. Results are
+saved as JSON and can be compared with a baseline::
+
+    $ python -m benchmarks run -o baseline.json
+    $ python -m benchmarks run -o current.json
+    $ python -m benchmarks compare baseline.json current.json
+
+``compare`` exits with a non zero status when a benchmark is slower than
+the baseline by more than the threshold (10% by default).
+"""
+
+import datetime
+import fnmatch
+import json
+import platform
+import statistics
+import timeit
+
+
+__all__ = ['benchmark', 'run', 'save', 'load', 'compare',
+           'format_results', 'format_comparison']
+
+#: the version of the format of the JSON results
+RESULTS_VERSION = 1
+
+#: the registered benchmarks: ``{name: (setup, param)}``
+BENCHMARKS = {}
+
+
+def benchmark(*params):
+    """Register a benchmark. The decorated function is called with each of
+    ``params`` (or with no argument when there are no params) and returns
+    the callable which is timed, so the setup is not measured::
+
+        @benchmark('1KB', '1MB')
+        def parse(size):
+            body = make_body(size)
+            return lambda: parse_body(body)
+
+    The names of the benchmarks are the name of the function followed by
+    the param, like ``parse[1KB]``.
+    """
+    def decorator(func):
+        if not params:
+            BENCHMARKS[func.__name__] = (func, None)
+        for param in params:
+            BENCHMARKS['%s[%s]' % (func.__name__, param)] = (func, param)
+        return func
+    return decorator
+
+
+def select(patterns=None):
+    """Return the names of the benchmarks equal to or matching one of the
+    shell-style ``patterns``, or all the names"""
+    if not BENCHMARKS:
+        from benchmarks import suite  # NOQA: registers the benchmarks
+    if not patterns:
+        return list(BENCHMARKS)
+    return [name for name in BENCHMARKS
+            if any(name == pattern or fnmatch.fnmatchcase(name, pattern)
+                   for pattern in patterns)]
+
+
+def measure(func, repeat=5, min_time=.2):
+    """Time ``func``. The number of calls per measure is chosen so one
+    measure lasts at least ``min_time`` seconds. Return a dict of the
+    min, median and mean seconds per call."""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed] + timer.repeat(repeat - 1, number)
+    times = [seconds / number for seconds in times]
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+    }
+
+
+def run(patterns=None, repeat=5, min_time=.2, progress=None):
+    """Run the benchmarks matching ``patterns``. ``progress`` is called
+    with the name and the result of each benchmark. Return a dict of
+    results which can be given to :func:`save`."""
+    results = {}
+    for name in select(patterns):
+        setup, param = BENCHMARKS[name]
+        func = setup() if param is None else setup(param)
+        results[name] = measure(func, repeat=repeat, min_time=min_time)
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'version': RESULTS_VERSION,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'webtest': webtest_version(),
+        'results': results,
+    }
+
+
+def webtest_version():
+    try:
+        from importlib import metadata
+        return metadata.version('WebTest')
+    except Exception:  # pragma: no cover
+        return None
+
+
+def save(results, path):
+    with open(path, 'w') as fd:
+        json.dump(results, fd, indent=2, sort_keys=True)
+        fd.write('\n')
+
+
+def load(path):
+    with open(path) as fd:
+        results = json.load(fd)
+    if results.get('version') != RESULTS_VERSION:
+        raise ValueError('%s: unsupported results version %r' % (
+            path, results.get('version')))
+    return results
+
+
+def compare(baseline, current, threshold=.1, key='min'):
+    """Compare the ``key`` timings of two results of :func:`run`. Return a
+    list of ``(name, baseline, current, change, regression)`` tuples for
+    the benchmarks found in both results, ``change`` being relative to the
+    baseline and ``regression`` True when ``change`` exceeds
+    ``threshold``."""
+    rows = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        old, new = reference[key], result[key]
+        change = new / old - 1 if old else 0
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            break
+    else:
+        unit, scale = 'ns', 1e-9
+    return '%.3g %s' % (seconds / scale, unit)
+
+
+def format_results(results):
+    """Format the results of :func:`run` as a table"""
+    lines = ['%-40s %12s %12s %10s' % ('benchmark', 'min', 'median',
+                                       'calls')]
+    for name, result in results['results'].items():
+        lines.append('%-40s %12s %12s %10d' % (
+            name, format_time(result['min']), format_time(result['median']),
+            result['number'] * result['repeat']))
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    """Format the result of :func:`compare` as a table"""
+    lines = ['%-40s %12s %12s %9s' % ('benchmark', 'baseline', 'current',
+                                      'change')]
+    for name, old, new, change, regression in rows:
+        lines.append('%-40s %12s %12s %+8.1f%%%s' % (
+            name, format_time(old), format_time(new), change * 100,
+            '  REGRESSION' if regression else ''))
+    return '\n'.join(lines)
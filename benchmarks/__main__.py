@@ -0,0 +1,104 @@
+"""
+Command line interface of the benchmarks::
+
+    python -m benchmarks [run] [-k PATTERN] [-o results.json]
+    python -m benchmarks compare baseline.json current.json [-t 10%]
+"""
+
+import argparse
+import sys
+
+import benchmarks
+
+
+def parse_threshold(value):
+    value = value.strip()
+    if value.endswith('%'):
+        return float(value[:-1]) / 100
+    return float(value)
+
+
+def run(args):
+    def progress(name, result):
+        print('%-40s %12s' % (name, benchmarks.format_time(result['min'])),
+              file=sys.stderr)
+    results = benchmarks.run(args.patterns, repeat=args.repeat,
+                             min_time=args.min_time, progress=progress)
+    print(benchmarks.format_results(results))
+    if args.output:
+        benchmarks.save(results, args.output)
+    if args.baseline:
+        return compare_results(benchmarks.load(args.baseline), results,
+                               args.threshold)
+    return 0
+
+
+def compare_results(baseline, current, threshold):
+    rows = benchmarks.compare(baseline, current, threshold)
+    print(benchmarks.format_comparison(rows))
+    regressions = [row[0] for row in rows if row[-1]]
+    if regressions:
+        print('%d regression(s) above %.0f%%: %s' % (
+            len(regressions), threshold * 100, ', '.join(regressions)))
+        return 1
+    return 0
+
+
+def compare(args):
+    return compare_results(benchmarks.load(args.baseline),
+                           benchmarks.load(args.current), args.threshold)
+
+
+def list_benchmarks(args):
+    for name in benchmarks.select(args.patterns):
+        print(name)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks of webtest')
+    commands = parser.add_subparsers(dest='command')
+
+    def add_threshold(parser):
+        parser.add_argument('-t', '--threshold', type=parse_threshold,
+                            default=.1,
+                            help='regression threshold, like 10%% '
+                                 '(default)')
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-k', dest='patterns', action='append',
+                            help='only run the benchmarks matching this '
+                                 'shell-style pattern')
+    run_parser.add_argument('-o', '--output', help='save the results to '
+                                                   'this JSON file')
+    run_parser.add_argument('-b', '--baseline', help='compare the results '
+                                                     'with this JSON file')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=.2,
+                            help='minimum duration of a measure, in seconds')
+    add_threshold(run_parser)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser(
+        'compare', help='compare two results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    add_threshold(compare_parser)
+    compare_parser.set_defaults(func=compare)
+
+    list_parser = commands.add_parser('list', help='list the benchmarks')
+    list_parser.add_argument('patterns', nargs='*')
+    list_parser.set_defaults(func=list_benchmarks)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h',
+                                                               '--help'):
+        argv = ['run'] + list(argv)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
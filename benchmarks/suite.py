@@ -0,0 +1,105 @@
+"""
+The benchmarks run by ``python -m benchmarks``. The application is the
+benchmark mode of :class:`webtest.debugapp.DebugApp`, so the time measured
+is mostly spent in webtest.
+"""
+
+import webob
+
+from benchmarks import benchmark
+from webtest.debugapp import DebugApp
+import webtest
+
+
+SIZES = {'1KB': 1024, '10KB': 10 * 1024, '100KB': 100 * 1024,
+         '1MB': 1024 ** 2, '10MB': 10 * 1024 ** 2}
+
+
+def make_app(**kwargs):
+    kwargs.setdefault('lint', False)
+    return webtest.TestApp(DebugApp(), **kwargs)
+
+
+@benchmark()
+def bare_wsgi_call():
+    app = DebugApp()
+    environ = webob.Request.blank('/?size=1KB').environ
+
+    def call():
+        b''.join(app(dict(environ), lambda status, headers: None))
+    return call
+
+
+@benchmark()
+def testapp_get():
+    app = make_app()
+    return lambda: app.get('/?size=1KB')
+
+
+@benchmark()
+def testapp_post():
+    app = make_app()
+    params = {'name': 'value', 'other': 'other value'}
+    return lambda: app.post('/?size=1KB', params)
+
+
+@benchmark()
+def testapp_post_json():
+    app = make_app()
+    data = {'items': list(range(100)), 'name': 'value'}
+    return lambda: app.post_json('/?size=1KB', data)
+
+
+@benchmark('lint', 'no_lint')
+def lint(mode):
+    app = make_app(lint=mode == 'lint')
+    return lambda: app.get('/?size=1KB&chunks=10&cookies=5')
+
+
+@benchmark('1KB', '100KB', '1MB')
+def encode_multipart(size):
+    app = make_app()
+    params = [('name', 'value'), ('other', 'other value')]
+    files = [('file', 'file.bin', b'x' * SIZES[size])]
+    return lambda: app.encode_multipart(params, files)
+
+
+def page(size):
+    app = make_app()
+    return app, app.get('/?forms=20&links=100&size=%d' % SIZES[size])
+
+
+@benchmark('10KB', '1MB', '10MB')
+def forms(size):
+    app, res = page(size)
+
+    def parse():
+        res._forms_indexed = None
+        return res.forms
+    return parse
+
+
+@benchmark('10KB', '1MB', '10MB')
+def click(size):
+    app, res = page(size)
+    return lambda: res.click(linkid='link-99')
+
+
+@benchmark(10, 100, 1000)
+def mustcontain(needles):
+    app, res = page('1MB')
+    strings = ['/link/%d"' % (i % 100) for i in range(needles)]
+    return lambda: res.mustcontain(*strings)
+
+
+@benchmark(10, 100, 1000)
+def cookies(count):
+    app = make_app()
+    app.set_cookies({'cookie%d' % i: 'value%d' % i for i in range(count)})
+    return lambda: app.get('/?size=0')
+
+
+@benchmark(10, 100)
+def set_cookies(count):
+    app = make_app()
+    return lambda: app.get('/?size=0&cookies=%d' % count)
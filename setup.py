@@ -54,6 +54,7 @@ setup(name='WebTest',
           'ez_setup',
           'examples',
           'tests',
+          'benchmarks',
           'bootstrap',
           'bootstrap-py3k',
       ]),
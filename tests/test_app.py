@@ -2,12 +2,20 @@ from http import cookiejar as http_cookiejar
 from webob import Request
 from webob import Response
 from webtest.compat import to_bytes
+from webtest.compat import escape_cookie_value
+from webtest.compat import unescape_cookie_value
+from webtest.compat import COOKIE_ESCAPE_CHAR_MAP
 from collections import OrderedDict
 from webtest.debugapp import debug_app
 from webtest import http
 from tests.compat import unittest
 import os
+import shutil
+import socket
+import tempfile
+import time
 from unittest import mock
+import webob
 import webtest
 print('hello')
 class TestApp(unittest.TestCase):
@@ -169,6 +177,13 @@ class TestPasteVariables(unittest.TestCase):
         resp = app.do_request(req, '*', False)
         self.assertEqual(resp.check, '1')
 
+    def test_paste_testing_variables_unused_features(self):
+        names = ('profile', 'memory', 'timings', 'lint_report')
+        app = self.call_FUT(**{name: name for name in names})
+        resp = app.do_request(Request.blank('/'), '*', False)
+        for name in names:
+            self.assertEqual(getattr(resp, name), name)
+
 
 class TestCookies(unittest.TestCase):
 
@@ -205,6 +220,29 @@ class TestCookies(unittest.TestCase):
         app.get('/')
         app.reset()
 
+    def test_set_cookies(self):
+        def cookie_app(environ, start_response):
+            req = Request(environ)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [to_bytes(repr(sorted(req.cookies.items())))]
+
+        app = webtest.TestApp(cookie_app)
+        app.set_cookies({'foo': 'bar', 'fizz': ';bar=baz'})
+        app.set_cookies([('token', 'a"b\\c')])
+        res = app.get('/')
+        self.assertEqual(res.text, repr([('fizz', ';bar=baz'), ('foo', 'bar'),
+                                         ('token', 'a"b\\c')]))
+        self.assertEqual({c.domain for c in app.cookiejar}, {'.localhost'})
+
+    def test_escape_cookie_value(self):
+        for value in ['bar', ';bar=baz', 'a"b\\c', '\x00\x7f\xe9,', '\u20ac',
+                      '\\012', '']:
+            escaped = escape_cookie_value(value)
+            self.assertEqual(escaped, '"' + ''.join(
+                COOKIE_ESCAPE_CHAR_MAP.get(c, c) for c in value) + '"')
+            self.assertEqual(unescape_cookie_value(escaped), value)
+        self.assertEqual(unescape_cookie_value('bar'), 'bar')
+
     def test_preserves_cookies(self):
         def cookie_app(environ, start_response):
             req = Request(environ)
@@ -389,6 +427,127 @@ class TestCookies(unittest.TestCase):
         self.assertEqual(dict(res.request.cookies), {})
 
 
+class TestFork(unittest.TestCase):
+
+    def test_fork(self):
+        app = webtest.TestApp(debug_app, extra_environ={'HTTP_HOST': 'h'},
+                              timings=True)
+        app.set_cookie('session', 'abc')
+        app.authorization = ('Bearer', 'token')
+        app.add_hook('before_request', lambda req: None)
+        app.get('/')
+        fork = app.fork()
+        self.assertIs(fork.app, app.app)
+        self.assertIs(fork.timings, app.timings)
+        self.assertIs(fork._lint_app, app._lint_app)
+        self.assertEqual(fork.cookies, {'session': '"abc"'})
+        self.assertEqual(fork.authorization, ('Bearer', 'token'))
+
+        fork.set_cookie('fork', '1')
+        fork.authorization = None
+        fork.extra_environ['HTTP_HOST'] = 'fork'
+        fork.add_hook('after_response', lambda req, res: None)
+        self.assertEqual(app.cookies, {'session': '"abc"'})
+        self.assertEqual(fork.cookies, {'session': '"abc"', 'fork': '"1"'})
+        self.assertEqual(app.authorization, ('Bearer', 'token'))
+        self.assertEqual(app.extra_environ['HTTP_AUTHORIZATION'],
+                         'Bearer token')
+        self.assertEqual(app.extra_environ['HTTP_HOST'], 'h')
+        self.assertNotIn('after_response', app._hooks)
+
+        res = fork.get('/')
+        self.assertIn(b'HTTP_HOST: fork', res.body)
+        self.assertNotIn(b'HTTP_AUTHORIZATION', res.body)
+        app.reset()
+        self.assertEqual(fork.cookies, {'session': '"abc"', 'fork': '"1"'})
+
+    def test_cookies_copied_on_write(self):
+        app = webtest.TestApp(debug_app)
+        app.set_cookie('session', 'abc')
+        fork = app.fork()
+        self.assertIs(fork.cookiejar._cookies, app.cookiejar._cookies)
+        app.set_cookie('other', '1')
+        self.assertIsNot(fork.cookiejar._cookies, app.cookiejar._cookies)
+        self.assertEqual(fork.cookies, {'session': '"abc"'})
+
+    def test_fork_http_cookiejar(self):
+        app = webtest.TestApp(debug_app, cookiejar=http_cookiejar.CookieJar())
+        app.set_cookie('session', 'abc')
+        fork = app.fork()
+        self.assertIsInstance(fork.cookiejar, http_cookiejar.CookieJar)
+        fork.set_cookie('fork', '1')
+        self.assertEqual(app.cookies, {'session': '"abc"'})
+        self.assertEqual(fork.cookies, {'session': '"abc"', 'fork': '"1"'})
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.path = os.path.join(self.dirname, 'session.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_save_and_load(self):
+        def cookie_app(environ, start_response):
+            start_response('200 OK', [
+                ('Content-Type', 'text/plain'),
+                ('Set-Cookie', 'sid=42; Path=/; HttpOnly'),
+                ('Set-Cookie', 'theme=dark; Path=/app; '
+                               'Expires=Fri, 01-Jan-2100 00:00:00 GMT'),
+            ])
+            return [b'ok']
+        app = webtest.TestApp(cookie_app,
+                              extra_environ={'REMOTE_USER': 'bob',
+                                             'wsgi.input_terminated': True,
+                                             'paste.obj': object()})
+        app.authorization = ('Basic', ('bob', 'secret'))
+        app.get('/')
+        app.save_session(self.path)
+
+        other = webtest.TestApp(debug_app,
+                                extra_environ={'HTTP_ACCEPT': 'text/html'})
+        other.set_cookie('stale', '1')
+        other.load_session(self.path)
+        self.assertEqual(other.cookies, {'sid': '42', 'theme': 'dark'})
+        cookies = {c.name: c for c in other.cookiejar}
+        self.assertEqual(cookies['theme'].path, '/app')
+        self.assertEqual(cookies['theme'].expires, 4102444800)
+        self.assertTrue(cookies['sid'].has_nonstandard_attr('HttpOnly'))
+        self.assertEqual(other.authorization, ('Basic', ('bob', 'secret')))
+        self.assertEqual(other.extra_environ['REMOTE_USER'], 'bob')
+        self.assertEqual(other.extra_environ['HTTP_ACCEPT'], 'text/html')
+        self.assertNotIn('paste.obj', other.extra_environ)
+        res = other.get('/')
+        self.assertIn(b'HTTP_COOKIE: sid=42', res.body)
+        self.assertIn(b'HTTP_AUTHORIZATION: Basic', res.body)
+
+    def test_load_without_authorization(self):
+        webtest.TestApp(debug_app).save_session(self.path)
+        app = webtest.TestApp(debug_app)
+        app.authorization = ('Bearer', 'token')
+        app.load_session(self.path)
+        self.assertIsNone(app.authorization)
+        self.assertNotIn('HTTP_AUTHORIZATION', app.extra_environ)
+
+    def test_authorization_header_in_extra_environ(self):
+        app = webtest.TestApp(
+            debug_app, extra_environ={'HTTP_AUTHORIZATION': 'Bearer abc'})
+        app.save_session(self.path)
+        other = webtest.TestApp(debug_app)
+        other.load_session(self.path)
+        self.assertEqual(other.extra_environ,
+                         {'HTTP_AUTHORIZATION': 'Bearer abc'})
+        other.get('/').mustcontain('HTTP_AUTHORIZATION: Bearer abc')
+
+    def test_invalid_file(self):
+        with open(self.path, 'w') as fd:
+            fd.write('{"version": 0}')
+        app = webtest.TestApp(debug_app)
+        self.assertRaises(ValueError, app.load_session, self.path)
+
+
 class TestEnviron(unittest.TestCase):
 
     def test_get_extra_environ(self):
@@ -681,6 +840,32 @@ class TestWSGIProxy(unittest.TestCase):
         self.s.shutdown()
 
 
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+class TestUnixSocketProxy(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.s = http.StopableWSGIServer.create(
+            debug_app, unix_socket=os.path.join(self.dirname, 'app.sock'))
+        self.s.wait()
+
+    def test_proxy_with_unix_url(self):
+        self.assertTrue(self.s.application_url.startswith('http+unix://%2F'))
+        app = webtest.TestApp(self.s.application_url)
+        resp = app.get('/path?a=1')
+        self.assertEqual(resp.status_int, 200)
+        resp.mustcontain('PATH_INFO: /path', 'QUERY_STRING: a=1',
+                         'HTTP_HOST: localhost')
+        resp = app.post('/', {'x': 'y'})
+        resp.mustcontain('x=y')
+        app.get('/?status=404', status=404)
+
+    def tearDown(self):
+        self.s.shutdown()
+        self.assertEqual(os.listdir(self.dirname), [])
+        shutil.rmtree(self.dirname)
+
+
 class TestAppXhrParam(unittest.TestCase):
 
     def setUp(self):
@@ -703,3 +888,313 @@ class TestRequest(unittest.TestCase):
 
     def test_pytest_collection_disabled(self):
         self.assertFalse(webtest.TestRequest.__test__)
+
+
+def chunked_application(environ, start_response):
+    def chunks():
+        for i in range(3):
+            yield b'chunk'
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return chunks()
+
+
+class TestProfile(unittest.TestCase):
+
+    def profiled_functions(self, resp):
+        return {func for (filename, line, func) in resp.profile.stats}
+
+    def test_no_profile_by_default(self):
+        app = webtest.TestApp(chunked_application)
+        resp = app.get('/')
+        self.assertFalse(hasattr(resp, 'profile'))
+
+    def test_profile_request(self):
+        app = webtest.TestApp(chunked_application)
+        resp = app.get('/', profile=True)
+        self.assertEqual(resp.body, b'chunkchunkchunk')
+        # the app_iter consumption is part of the profile
+        self.assertIn('chunks', self.profiled_functions(resp))
+        self.assertIn('chunked_application', self.profiled_functions(resp))
+
+    def test_profile_patterns(self):
+        app = webtest.TestApp(chunked_application,
+                              profile=['/reports/*', '/admin'])
+        self.assertIsNotNone(app.get('/reports/daily').profile)
+        self.assertIsNotNone(app.post('/admin').profile)
+        self.assertFalse(hasattr(app.get('/'), 'profile'))
+        self.assertFalse(hasattr(app.get('/reports/daily', profile=False),
+                                 'profile'))
+        self.assertIsNotNone(app.get('/', profile=True).profile)
+
+    def test_profile_dir(self):
+        dirname = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dirname)
+        app = webtest.TestApp(chunked_application, profile=True,
+                              profile_dir=os.path.join(dirname, 'profiles'))
+        app.get('/reports/daily')
+        app.post_json('/', {})
+        filenames = sorted(os.listdir(os.path.join(dirname, 'profiles')))
+        self.assertEqual(len(filenames), 2)
+        self.assertTrue(filenames[0].endswith('-GET-reports_daily.prof'))
+        self.assertTrue(filenames[1].endswith('-POST-root.prof'))
+
+
+def allocating_application(environ, start_response):
+    size = int(environ['QUERY_STRING'] or 0)
+    data = [bytearray(1024) for i in range(size)]
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'%d' % len(data)]
+
+
+retained = []
+
+
+def retaining_application(environ, start_response):
+    retained.append(bytearray(2 * 1024 * 1024))  # retaining line
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+class TestMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.app = webtest.TestApp(allocating_application)
+
+    def test_no_memory_report_by_default(self):
+        resp = self.app.get('/')
+        self.assertFalse(hasattr(resp, 'memory'))
+
+    def test_memory_report(self):
+        resp = self.app.get('/?2048', max_memory='50MB')
+        self.assertGreater(resp.memory.peak, 2 * 1024 * 1024)
+        self.assertIn('Peak memory: ', str(resp.memory))
+
+    def test_memory_budget_exceeded(self):
+        with self.assertRaises(webtest.AppError) as ctx:
+            self.app.post('/?2048', max_memory='1MB')
+        message = str(ctx.exception)
+        self.assertIn('Memory budget exceeded', message)
+        self.assertIn('more than 1.0 MB', message)
+
+    def test_memory_budget_lists_the_application(self):
+        self.addCleanup(retained.clear)
+        app = webtest.TestApp(retaining_application)
+        with self.assertRaises(webtest.AppError) as ctx:
+            app.get('/', max_memory='1MB')
+        message = str(ctx.exception)
+        self.assertIn('still held at the end of the request', message)
+        code = retaining_application.__code__
+        self.assertIn('test_app.py:%d' % (code.co_firstlineno + 1), message)
+        filenames = [frame.filename for stat in app.get(
+            '/', max_memory='50MB').memory.retained
+            for frame in stat.traceback]
+        for path in (webob.__file__, webtest.__file__):
+            dirname = os.path.dirname(path)
+            self.assertFalse([filename for filename in filenames
+                              if filename.startswith(dirname)], filenames)
+
+
+class TestTimings(unittest.TestCase):
+
+    def test_no_timings_by_default(self):
+        app = webtest.TestApp(debug_app)
+        self.assertIsNone(app.timings)
+        resp = app.get('/form.html')
+        self.assertFalse(hasattr(resp, 'timings'))
+        self.assertIn('name', resp.form.fields)
+
+    def test_request_timings(self):
+        app = webtest.TestApp(debug_app, timings=True)
+        resp = app.get('/form.html')
+        self.assertEqual(
+            [phase for phase, start, end in resp.timings.phases],
+            ['environ', 'cookie_header', 'lint', 'app', 'lint', 'app_iter',
+             'lint', 'decode_content', 'cookie_extract'])
+        self.assertEqual(resp.timings.calls['lint'], 1)
+        resp.form
+        self.assertEqual(
+            [phase for phase, start, end in resp.timings.phases][-2:],
+            ['html', 'forms'])
+        for phase, start, end in resp.timings.phases:
+            self.assertLessEqual(start, end)
+        self.assertIn('cookie_extract', str(resp.timings))
+
+    def test_cumulative_timings(self):
+        app = webtest.TestApp(debug_app, timings=True)
+        app.get('/')
+        app.post('/')
+        app.request('/')
+        self.assertEqual(app.timings.phases['app'][0], 3)
+        self.assertEqual(app.timings.phases['environ'][0], 3)
+        self.assertEqual(app.timings.phases['lint'][0], 3)
+        self.assertEqual(set(app.timings.durations),
+                         {'environ', 'cookie_header', 'lint', 'app',
+                          'app_iter', 'decode_content', 'cookie_extract'})
+        table = app.timings.table()
+        self.assertTrue(table.startswith('phase'))
+        self.assertIn('app_iter', table)
+        app.timings.reset()
+        self.assertEqual(app.timings.durations, {})
+
+    def test_lint_is_not_counted_as_app(self):
+        app = webtest.TestApp(slow_application, timings=True)
+        with mock.patch('webtest.lint.check_environ',
+                        side_effect=lambda environ: time.sleep(.05)):
+            resp = app.get('/?sleep=.02')
+        durations = resp.timings.durations
+        self.assertGreaterEqual(durations['lint'], .05)
+        self.assertGreaterEqual(durations['app_iter'], .02)
+        self.assertLess(durations['app'] + durations['app_iter'], .05)
+
+    def test_timings_without_lint(self):
+        app = webtest.TestApp(debug_app, timings=True, lint=False)
+        resp = app.get('/')
+        self.assertEqual(
+            [phase for phase, start, end in resp.timings.phases],
+            ['environ', 'cookie_header', 'app', 'app_iter',
+             'decode_content', 'cookie_extract'])
+
+    def test_shared_timings(self):
+        timings = webtest.perf.Timings()
+        webtest.TestApp(debug_app, timings=timings).get('/')
+        webtest.TestApp(debug_app, timings=timings).get('/')
+        self.assertEqual(timings.phases['app'][0], 2)
+
+    def test_json_timings(self):
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [b'{"a": 1}']
+        resp = webtest.TestApp(app, timings=True).get('/')
+        self.assertEqual(resp.json, {'a': 1})
+        self.assertIn('json', resp.timings.durations)
+
+
+def slow_application(environ, start_response):
+    req = Request(environ)
+
+    def chunks():
+        time.sleep(float(req.GET.get('sleep', 0)))
+        yield b'x' * int(req.GET.get('size', 0))
+    environ['paste.testing_variables']['queries'] = [
+        'SELECT 1'] * int(req.GET.get('queries', 0))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return chunks()
+
+
+class TestPerformanceBudgets(unittest.TestCase):
+
+    def setUp(self):
+        self.app = webtest.TestApp(slow_application)
+
+    def test_within_budgets(self):
+        resp = self.app.get('/?size=10&queries=2', max_time=5,
+                            max_body_size='1KB', max_queries=2)
+        self.assertEqual(len(resp.queries), 2)
+
+    def test_max_time(self):
+        with self.assertRaises(webtest.AppError) as ctx:
+            self.app.get('/?sleep=.05', max_time='10ms')
+        self.assertIn('time: 0.0', str(ctx.exception))
+        self.assertIn('(max 0.010s)', str(ctx.exception))
+
+    def test_max_time_excludes_lint(self):
+        self.assertTrue(self.app.lint)
+        with mock.patch('webtest.lint.check_environ',
+                        side_effect=lambda environ: time.sleep(.1)):
+            self.app.get('/?sleep=.01', max_time='80ms')
+            with self.assertRaises(webtest.AppError):
+                self.app.get('/?sleep=.1', max_time='80ms')
+
+    def test_max_time_without_lint(self):
+        app = webtest.TestApp(slow_application, lint=False)
+        app.get('/', max_time='1s')
+        self.assertRaises(webtest.AppError, app.get, '/?sleep=.05',
+                          max_time='10ms')
+
+    def test_max_body_size(self):
+        with self.assertRaises(webtest.AppError) as ctx:
+            self.app.post('/?size=2048', max_body_size='1KB')
+        self.assertIn('body size: 2.0 KB (max 1.0 KB)', str(ctx.exception))
+
+    def test_max_queries(self):
+        with self.assertRaises(webtest.AppError) as ctx:
+            self.app.get('/?queries=3', max_queries=2)
+        self.assertIn('queries: 3 (max 2)', str(ctx.exception))
+
+    def test_max_queries_counter(self):
+        def app(environ, start_response):
+            environ['paste.testing_variables']['sql_count'] = 3
+            start_response('200 OK', [])
+            return []
+        app = webtest.TestApp(app)
+        self.assertRaises(webtest.AppError, app.get, '/', max_queries=1)
+        app.queries_variable = 'sql_count'
+        with self.assertRaises(webtest.AppError) as ctx:
+            app.get('/', max_queries=2)
+        self.assertIn('queries: 3 (max 2)', str(ctx.exception))
+        self.assertEqual(app.get('/', max_queries=3).sql_count, 3)
+
+    def test_multiple_budgets(self):
+        with self.assertRaises(webtest.AppError) as ctx:
+            self.app.get('/?size=2048&queries=3', max_queries=2,
+                         max_body_size=1024)
+        message = str(ctx.exception)
+        self.assertTrue(message.startswith(
+            'Performance budget exceeded for http://localhost/'))
+        self.assertIn('queries: 3', message)
+        self.assertIn('body size: 2.0 KB', message)
+
+
+class TestHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.app = webtest.TestApp(debug_app)
+        self.calls = []
+
+    def before_request(self, req):
+        self.calls.append(('before_request', req.path_info))
+        req.headers['X-Hooked'] = 'yes'
+
+    def after_response(self, req, res):
+        self.calls.append(('after_response', res.status_int))
+
+    def on_error(self, req, exc):
+        self.calls.append(('on_error', type(exc).__name__))
+
+    def add_hooks(self):
+        self.app.add_hook('before_request', self.before_request)
+        self.app.add_hook('after_response', self.after_response)
+        self.app.add_hook('on_error', self.on_error)
+
+    def test_hooks(self):
+        self.add_hooks()
+        resp = self.app.get('/path')
+        resp.mustcontain('HTTP_X_HOOKED: yes')
+        self.assertEqual(self.calls, [('before_request', '/path'),
+                                      ('after_response', 200)])
+
+    def test_on_error(self):
+        self.add_hooks()
+        self.assertRaises(webtest.AppError, self.app.get, '/?status=404')
+        self.assertEqual(self.calls, [('before_request', '/'),
+                                      ('after_response', 404),
+                                      ('on_error', 'AppError')])
+        del self.calls[:]
+        self.assertRaises(Exception, self.app.get, '/?error=t')
+        self.assertEqual(self.calls, [('before_request', '/'),
+                                      ('on_error', 'Exception')])
+
+    def test_remove_hook(self):
+        self.add_hooks()
+        self.app.remove_hook('before_request', self.before_request)
+        self.app.remove_hook('after_response', self.after_response)
+        self.app.remove_hook('on_error', self.on_error)
+        self.assertEqual(self.app._hooks, {})
+        self.app.get('/')
+        self.assertEqual(self.calls, [])
+        self.assertRaises(ValueError, self.app.remove_hook,
+                          'on_error', self.on_error)
+
+    def test_unknown_event(self):
+        self.assertRaises(ValueError, self.app.add_hook,
+                          'after_request', self.after_response)
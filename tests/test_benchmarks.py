@@ -0,0 +1,72 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+
+from tests.compat import unittest
+from benchmarks import __main__ as cli
+import benchmarks
+
+
+def results(**timings):
+    return {'version': benchmarks.RESULTS_VERSION,
+            'results': {name: {'min': seconds, 'median': seconds,
+                               'number': 1, 'repeat': 1}
+                        for name, seconds in timings.items()}}
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dirname)
+
+    def test_select(self):
+        names = benchmarks.select()
+        self.assertIn('testapp_get', names)
+        self.assertEqual(benchmarks.select(['forms*']),
+                         ['forms[10KB]', 'forms[1MB]', 'forms[10MB]'])
+
+    def test_run(self):
+        seen = []
+        data = benchmarks.run(['bare_wsgi_call', 'cookies[10]'], repeat=2,
+                              min_time=.001,
+                              progress=lambda name, result: seen.append(name))
+        self.assertEqual(seen, ['bare_wsgi_call', 'cookies[10]'])
+        result = data['results']['cookies[10]']
+        self.assertEqual(result['repeat'], 2)
+        self.assertLessEqual(result['min'], result['median'])
+        self.assertIn('cookies[10]', benchmarks.format_results(data))
+
+    def test_save_and_load(self):
+        path = os.path.join(self.dirname, 'results.json')
+        data = results(a=1e-6)
+        benchmarks.save(data, path)
+        self.assertEqual(benchmarks.load(path), data)
+        benchmarks.save({'version': 0}, path)
+        self.assertRaises(ValueError, benchmarks.load, path)
+
+    def test_compare(self):
+        rows = benchmarks.compare(results(a=1e-3, b=1e-3, c=1.),
+                                  results(a=1.05e-3, b=1.2e-3, d=1.))
+        self.assertEqual([(name, regression)
+                          for name, old, new, change, regression in rows],
+                         [('a', False), ('b', True)])
+        self.assertIn('REGRESSION', benchmarks.format_comparison(rows))
+
+    def test_cli_compare(self):
+        baseline = os.path.join(self.dirname, 'baseline.json')
+        current = os.path.join(self.dirname, 'current.json')
+        benchmarks.save(results(a=1e-3), baseline)
+        benchmarks.save(results(a=1.2e-3), current)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cli.main(['compare', baseline, current]), 1)
+            self.assertEqual(cli.main(['compare', baseline, current,
+                                       '-t', '25%']), 0)
+        self.assertIn('1 regression(s) above 10%: a', output.getvalue())
+
+    def test_parse_threshold(self):
+        self.assertEqual(cli.parse_threshold('15%'), .15)
+        self.assertEqual(cli.parse_threshold('0.2'), .2)
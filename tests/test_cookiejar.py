@@ -0,0 +1,134 @@
+from http import cookiejar as http_cookiejar
+from unittest import mock
+
+from webob import Request
+from webob import Response
+
+from .compat import unittest
+from webtest import utils
+from webtest.cookiejar import CookieJar
+from webtest.cookiejar import CookiePolicy
+import webtest
+
+
+def make_cookie(name, domain='localhost.local', path='/', secure=False,
+                expires=None, port=None, version=0):
+    return http_cookiejar.Cookie(
+        version=version, name=name, value='v_' + name, port=port,
+        port_specified=port is not None, domain=domain,
+        domain_specified=domain.startswith('.'),
+        domain_initial_dot=domain.startswith('.'), path=path,
+        path_specified=True, secure=secure, expires=expires, discard=False,
+        comment=None, comment_url=None, rest={}, rfc2109=False)
+
+
+COOKIES = [
+    make_cookie('root'),
+    make_cookie('sub', path='/sub'),
+    make_cookie('subslash', path='/sub/'),
+    make_cookie('other', path='/other'),
+    make_cookie('prefix', path='/su'),
+    make_cookie('secure', secure=True),
+    make_cookie('expired', expires=1),
+    make_cookie('future', expires=4102444800),
+    make_cookie('port', port='8080'),
+    make_cookie('ports', port='80,8080'),
+    make_cookie('rfc2965', version=1),
+    make_cookie('localhost', domain='.localhost'),
+    make_cookie('dotted', domain='.example.com'),
+    make_cookie('host', domain='www.example.com'),
+    make_cookie('elsewhere', domain='example.org'),
+]
+
+URLS = [
+    'http://localhost/',
+    'http://localhost/sub',
+    'http://localhost/sub/page',
+    'http://localhost/subway',
+    'https://localhost/other/page',
+    'http://localhost:8080/',
+    'http://www.example.com/',
+    'https://api.example.com/sub',
+    'http://example.org/',
+]
+
+
+def cookie_header(jar, url):
+    req = Request.blank(url)
+    jar.add_cookie_header(utils._RequestCookieAdapter(req))
+    return req.headers.get('Cookie')
+
+
+class TestCookieJar(unittest.TestCase):
+
+    def jars(self, cookies=COOKIES):
+        jar = CookieJar()
+        reference = http_cookiejar.CookieJar(policy=CookiePolicy())
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+            reference.set_cookie(cookie)
+        return jar, reference
+
+    def test_default_policy(self):
+        self.assertIsInstance(CookieJar()._policy, CookiePolicy)
+        self.assertIsInstance(webtest.TestApp(None).cookiejar, CookieJar)
+
+    def test_same_cookies_as_http_cookiejar(self):
+        jar, reference = self.jars()
+        self.assertTrue(jar._fast_policy())
+        for url in URLS:
+            self.assertEqual(cookie_header(jar, url),
+                             cookie_header(reference, url), url)
+
+    def test_other_policies(self):
+        policy = CookiePolicy(blocked_domains=['localhost.local'])
+        jar = CookieJar(policy)
+        self.assertFalse(jar._fast_policy())
+        jar.set_cookie(make_cookie('root'))
+        self.assertIsNone(cookie_header(jar, 'http://localhost/'))
+        jar = CookieJar(http_cookiejar.DefaultCookiePolicy())
+        self.assertFalse(jar._fast_policy())
+
+    def test_empty_jar(self):
+        jar = CookieJar()
+        with mock.patch.object(jar, '_fast_policy') as fast_policy, \
+                mock.patch('http.cookiejar.eff_request_host') as host:
+            self.assertIsNone(cookie_header(jar, 'http://localhost/'))
+        self.assertFalse(fast_policy.called)
+        self.assertFalse(host.called)
+
+    def test_fast_policy_is_cached(self):
+        jar = CookieJar()
+        self.assertTrue(jar._fast_policy())
+        with mock.patch.object(CookiePolicy, 'blocked_domains') as blocked:
+            self.assertTrue(jar._fast_policy())
+        self.assertFalse(blocked.called)
+        jar.set_policy(http_cookiejar.DefaultCookiePolicy())
+        self.assertFalse(jar._fast_policy())
+
+    def test_clear_expired_cookies(self):
+        jar, reference = self.jars()
+        self.assertEqual(jar._next_expiry, 1)
+        jar.clear_expired_cookies()
+        self.assertEqual(len(jar), len(COOKIES) - 1)
+        self.assertEqual(jar._next_expiry, 4102444800)
+        with mock.patch('time.time', return_value=1):
+            jar.set_cookie(make_cookie('soon', expires=10))
+            jar.clear_expired_cookies()
+            self.assertEqual(len(jar), len(COOKIES))
+        with mock.patch('time.time', return_value=4102444801):
+            jar.clear_expired_cookies()
+        self.assertEqual(len(jar), len(COOKIES) - 2)
+        self.assertIsNone(jar._next_expiry)
+
+    def test_extract_cookies(self):
+        jar = CookieJar()
+        req = Request.blank('http://localhost/')
+        res = Response()
+        jar.extract_cookies(utils._ResponseCookieAdapter(res),
+                            utils._RequestCookieAdapter(req))
+        self.assertEqual(len(jar), 0)
+        res.set_cookie('spam', 'eggs')
+        jar.extract_cookies(utils._ResponseCookieAdapter(res),
+                            utils._RequestCookieAdapter(req))
+        self.assertEqual([c.name for c in jar], ['spam'])
@@ -1,7 +1,10 @@
 import os
 import sys
+import time
 import webtest
+from webtest.debugapp import bench_body
 from webtest.debugapp import debug_app
+from webtest.debugapp import make_debug_app
 from webtest.compat import to_bytes
 from webtest.compat import print_stderr
 from webtest.app import AppError
@@ -176,3 +179,71 @@ class TestTesting(unittest.TestCase):
             def items(self):
                 return [('a', '10'), ('a', '20')]
         self.app.post('/params', params=FakeDict())
+
+
+class TestBenchmarkMode(unittest.TestCase):
+
+    def setUp(self):
+        self.app = webtest.TestApp(debug_app)
+
+    def test_size(self):
+        res = self.app.get('/?size=1KB')
+        self.assertEqual(res.body, b'x' * 1024)
+        self.assertEqual(res.content_length, 1024)
+        self.assertEqual(res.content_type, 'text/plain')
+        self.assertIs(bench_body(1024), bench_body(1024))
+
+    def test_chunks(self):
+        chunks = []
+
+        def app(environ, start_response):
+            app_iter = debug_app(environ, start_response)
+            chunks.extend(app_iter)
+            return app_iter
+        res = webtest.TestApp(app).get('/?size=10&chunks=3')
+        self.assertEqual(res.body, b'x' * 10)
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 3, 3])
+
+    def test_latency(self):
+        start = time.perf_counter()
+        self.app.get('/?latency=50ms')
+        self.assertGreaterEqual(time.perf_counter() - start, .05)
+
+    def test_cookies(self):
+        res = self.app.get('/?cookies=5')
+        self.assertEqual(len(res.headers.getall('Set-Cookie')), 5)
+        self.assertEqual(len(self.app.cookies), 5)
+
+    def test_html(self):
+        res = self.app.get('/?forms=3&links=4&size=10KB')
+        self.assertEqual(res.content_type, 'text/html')
+        self.assertEqual(len(res.body), 10240)
+        self.assertEqual(res.forms['form-2'].action, '/form/2')
+        self.assertEqual(len(res.forms), 6)
+        self.assertEqual(len(res.html.find_all('a')), 4)
+        res = res.click(linkid='link-2')
+        res = self.app.get('/?forms=1').forms[0].submit()
+        res.mustcontain('field=0')
+
+    def test_config(self):
+        app = webtest.TestApp(make_debug_app({}, size='1KB', cookies='2'))
+        res = app.get('/')
+        self.assertEqual(len(res.body), 1024)
+        self.assertEqual(len(res.headers.getall('Set-Cookie')), 2)
+        # the query string takes precedence
+        self.assertEqual(len(app.get('/?size=10').body), 10)
+        self.assertRaises(TypeError, make_debug_app, {}, size_='1')
+
+    def test_head(self):
+        res = self.app.head('/?size=100')
+        self.assertEqual(res.content_length, 100)
+        self.assertEqual(res.body, b'')
+
+    def test_other_query_strings(self):
+        self.app.get('/?foo=bar').mustcontain('QUERY_STRING: foo=bar')
+
+    def test_invalid_query_strings(self):
+        res = self.app.get('/?size=abc&latency=soon')
+        res.mustcontain('QUERY_STRING: size=abc&latency=soon')
+        self.assertEqual(len(self.app.get('/?size=10&chunks=x').body), 10)
+        self.assertRaises(ValueError, make_debug_app, {}, size='abc')
@@ -1,7 +1,21 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from http import client
+from unittest import mock
+
 from tests.compat import unittest
 from webob import Request
 from webtest.debugapp import debug_app
 from webtest import http
+import webtest
 
 
 class TestServer(unittest.TestCase):
@@ -45,6 +59,17 @@ class TestServer(unittest.TestCase):
         resp = req.get_response(s.wrapper)
         self.assertEqual(resp.status_int, 304)
 
+    def test_wait_does_not_poll(self):
+        s = self.s
+        start = time.perf_counter()
+        self.assertTrue(s.wait())
+        self.assertTrue(s.ready.is_set())
+        conn = client.HTTPConnection(s.adj.host, s.adj.port)
+        conn.request('GET', '/__application__')
+        self.assertEqual(conn.getresponse().status, 200)
+        conn.close()
+        self.assertLess(time.perf_counter() - start, .3)
+
     def tearDown(self):
         self.s.shutdown()
 
@@ -58,8 +83,588 @@ class TestBrokenServer(unittest.TestCase):
         self.assertTrue(s.shutdown())
 
 
+class TestPorts(unittest.TestCase):
+
+    def test_port_zero(self):
+        s = http.StopableWSGIServer.create(debug_app)
+        try:
+            self.assertNotEqual(s.adj.port, 0)
+            self.assertEqual(s.adj.port, s.socket.getsockname()[1])
+            self.assertEqual(s.application_url,
+                             'http://127.0.0.1:%d/' % s.adj.port)
+            self.assertTrue(s.wait())
+        finally:
+            s.shutdown()
+
+    def test_port_range(self):
+        ports = http.PortRange(20000, 20100, worker='gw2', workers=4)
+        self.assertEqual(ports.ports, range(20050, 20075))
+        self.assertEqual(repr(ports), '<PortRange 20050-20075>')
+        self.assertEqual(http.PortRange(20000, 20100, 0, 1).ports,
+                         range(20000, 20100))
+        self.assertRaises(ValueError, http.PortRange, 20000, 20100, 4, 4)
+        self.assertRaises(ValueError, http.PortRange, 20000, 20002, 0, 3)
+
+    def test_port_range_from_environ(self):
+        self.assertIsNone(http.PortRange.from_environ({}))
+        with mock.patch.dict(os.environ, {'PYTEST_XDIST_WORKER': 'gw1',
+                                          'PYTEST_XDIST_WORKER_COUNT': '2'}):
+            ports = http.PortRange.from_environ(
+                {'WEBTEST_PORT_RANGE': '20000-20100'})
+        self.assertEqual(ports.ports, range(20050, 20100))
+        self.assertRaises(ValueError, http.PortRange.from_environ,
+                          {'WEBTEST_PORT_RANGE': '20000'})
+
+    def test_port_range_from_environ_is_kept(self):
+        environ = {'WEBTEST_PORT_RANGE': '20000-20100'}
+        ports = http.PortRange.from_environ(environ)
+        self.assertIs(http.PortRange.from_environ(dict(environ)), ports)
+        self.assertIsNot(http.PortRange.from_environ(
+            {'WEBTEST_PORT_RANGE': '20000-20101'}), ports)
+        # the rotation goes on from one call to the next
+        first = next(iter(ports))
+        self.assertNotEqual(
+            next(iter(http.PortRange.from_environ(environ))), first)
+
+    def test_create_in_range(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        ports = http.PortRange(port, port + 3, 0, 1)
+        servers = []
+        try:
+            # the first port is in use
+            servers.append(http.StopableWSGIServer.create(
+                debug_app, port_range=ports))
+            servers.append(http.StopableWSGIServer.create(
+                debug_app, port_range=ports))
+            self.assertEqual([s.adj.port for s in servers],
+                             [port + 1, port + 2])
+            for s in servers:
+                self.assertTrue(s.wait())
+            self.assertRaises(OSError, http.StopableWSGIServer.create,
+                              debug_app, port_range=ports)
+        finally:
+            sock.close()
+            for s in servers:
+                s.shutdown()
+
+    def test_create_in_environ_range(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        environ = {'WEBTEST_PORT_RANGE': '%d-%d' % (port, port + 1)}
+        with mock.patch.dict(os.environ, environ):
+            s = http.StopableWSGIServer.create(debug_app)
+        try:
+            self.assertEqual(s.adj.port, port)
+        finally:
+            s.shutdown()
+
+
 class TestClient(unittest.TestCase):
 
     def test_no_server(self):
         host, port = http.get_free_port()
         self.assertEqual(0, http.check_server(host, port, retries=2))
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'hello']
+
+
+def get(server, path='/'):
+    conn = client.HTTPConnection(server.adj.host, server.adj.port)
+    try:
+        conn.request('GET', path)
+        res = conn.getresponse()
+        return res.status, res.read()
+    finally:
+        conn.close()
+
+
+class TestServeFile(unittest.TestCase):
+
+    def setUp(self):
+        self.s = http.StopableWSGIServer.create(debug_app)
+        self.dirname = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dirname)
+
+    def tearDown(self):
+        self.s.shutdown()
+
+    def write(self, name, body):
+        filename = os.path.join(self.dirname, name)
+        with open(filename, 'wb') as fd:
+            fd.write(body)
+        return filename
+
+    def get(self, filename, host='localhost:80', etag=None):
+        req = Request.blank('/__file__?__file__=' + filename,
+                            headers={'Host': host})
+        if etag:
+            req.if_none_match = etag
+        return req.get_response(self.s.wrapper)
+
+    def test_rewrite(self):
+        filename = self.write('page.html', b'<a href="http://localhost/">')
+        resp = self.get(filename, 'example.com:8080')
+        self.assertEqual(resp.body, b'<a href="http://example.com:8080/">')
+        self.assertEqual(len(self.s.file_cache), 1)
+        resp = self.get(filename, 'other:80')
+        self.assertEqual(resp.body, b'<a href="http://other:80/">')
+        # the etag depends on the host
+        etag = resp.etag
+        self.assertEqual(self.get(filename, 'other:80', etag).status_int, 304)
+        self.assertEqual(self.get(filename, 'example.com:8080',
+                                  etag).status_int, 200)
+
+    def test_changed_file(self):
+        filename = self.write('page.html', b'http://localhost/ v1')
+        resp = self.get(filename)
+        self.assertEqual(resp.body, b'http://localhost:80/ v1')
+        etag = resp.etag
+        filename = self.write('page.html', b'http://localhost/ v22')
+        resp = self.get(filename, etag=etag)
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(resp.body, b'http://localhost:80/ v22')
+
+    def test_stream(self):
+        body = b'x' * (self.s.file_block_size * 2 + 1)
+        filename = self.write('bundle.js', body)
+        resp = self.get(filename)
+        self.assertEqual(resp.body, body)
+        # streamed once the file is known to need no rewriting
+        resp = self.get(filename)
+        self.assertEqual(resp.content_length, len(body))
+        chunks = list(resp.app_iter)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks), body)
+        self.assertEqual(self.get(filename, etag=resp.etag).status_int, 304)
+
+    def test_http(self):
+        self.s.wait()
+        filename = self.write('bundle.js', b'x' * 100000)
+        conn = client.HTTPConnection(self.s.adj.host, self.s.adj.port)
+        try:
+            for i in range(2):
+                conn.request('GET', '/__file__?__file__=' + filename)
+                res = conn.getresponse()
+                self.assertEqual(res.read(), b'x' * 100000)
+            conn.request('GET', '/__file__?__file__=' + filename,
+                         headers={'If-None-Match': res.getheader('ETag')})
+            res = conn.getresponse()
+            self.assertEqual(res.status, 304)
+            self.assertEqual(res.read(), b'')
+        finally:
+            conn.close()
+
+    def test_cache_size(self):
+        self.s.file_cache_size = 2
+        filenames = [self.write('%s.html' % i, b'page') for i in range(3)]
+        for filename in filenames:
+            self.get(filename)
+        self.assertEqual(list(self.s.file_cache), filenames[1:])
+
+    def test_not_a_file(self):
+        self.assertEqual(self.get(self.dirname).status_int, 404)
+        req = Request.blank('/__file__')
+        self.assertEqual(req.get_response(self.s.wrapper).status_int, 404)
+
+
+def slow_app(environ, start_response):
+    time.sleep(float(environ['QUERY_STRING'] or 0))
+    return hello_app(environ, start_response)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.s = http.StopableWSGIServer.create(slow_app)
+        self.s.wait()
+
+    def tearDown(self):
+        self.s.shutdown()
+
+    def metrics(self, path='/__metrics__'):
+        status, body = get(self.s, path)
+        self.assertEqual(status, 200)
+        return json.loads(body.decode('utf-8'))
+
+    def test_metrics(self):
+        self.assertEqual(get(self.s, '/a'), (200, b'hello'))
+        self.assertEqual(get(self.s, '/a'), (200, b'hello'))
+        self.assertEqual(get(self.s, '/b?0.05'), (200, b'hello'))
+        get(self.s, '/__application__')
+        metrics = self.metrics()
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['in_flight'], 0)
+        self.assertEqual(sorted(metrics['paths']), ['/a', '/b'])
+        self.assertEqual(metrics['paths']['/a']['count'], 2)
+        latency = metrics['paths']['/b']['latency']
+        self.assertGreaterEqual(latency['p50'], 50)
+        self.assertEqual(sorted(latency), ['max', 'p50', 'p90', 'p99'])
+        self.assertEqual(metrics['latency']['max'], latency['max'])
+        server = metrics['server']
+        self.assertEqual(server['threads'], 4)
+        # the thread serving the metrics
+        self.assertEqual(server['active_threads'], 1)
+        self.assertEqual(server['queue'], 0)
+        self.assertEqual(server['utilization'], .25)
+
+    def test_in_flight(self):
+        thread = threading.Thread(target=get, args=(self.s, '/slow?0.3'))
+        thread.start()
+        try:
+            for i in range(50):
+                metrics = self.metrics()
+                if metrics['in_flight']:
+                    break
+                time.sleep(.01)
+            self.assertEqual(metrics['in_flight'], 1)
+            self.assertEqual(metrics['server']['active_threads'], 2)
+        finally:
+            thread.join()
+        self.assertEqual(self.metrics()['in_flight'], 0)
+
+    def test_content_length_and_keep_alive(self):
+        class Sized:
+            def __init__(self, chunks):
+                self.chunks = chunks
+
+            def __iter__(self):
+                return iter(self.chunks)
+
+            def __len__(self):
+                return len(self.chunks)
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            if environ['PATH_INFO'] == '/sized':
+                return Sized([b'sized'])
+            if environ['PATH_INFO'] == '/file':
+                return environ['wsgi.file_wrapper'](open(__file__, 'rb'))
+            return [b'hello']
+        self.s.swap_app(app)
+        conn = client.HTTPConnection(self.s.adj.host, self.s.adj.port)
+        try:
+            for path, length in (('/', '5'), ('/sized', '5'), ('/', '5'),
+                                 ('/file', str(os.path.getsize(__file__)))):
+                conn.request('GET', path)
+                res = conn.getresponse()
+                res.read()
+                self.assertEqual(res.getheader('Content-Length'), length)
+                self.assertIsNone(res.getheader('Transfer-Encoding'))
+                self.assertFalse(res.will_close)
+        finally:
+            conn.close()
+        metrics = self.metrics()
+        self.assertEqual(metrics['requests'], 4)
+        self.assertEqual(metrics['paths']['/']['count'], 2)
+
+    def test_reset(self):
+        get(self.s, '/a')
+        self.assertEqual(self.metrics('/__metrics__?reset')['requests'], 1)
+        self.assertEqual(self.metrics(), {
+            'requests': 0, 'in_flight': 0, 'latency': {}, 'paths': {},
+            'server': {'threads': 4, 'active_threads': 1, 'queue': 0,
+                       'utilization': .25}})
+
+    def test_percentiles(self):
+        self.assertEqual(http.percentiles([]), {})
+        samples = [i / 1000. for i in range(100, 0, -1)]
+        self.assertEqual(http.percentiles(samples),
+                         {'p50': 50, 'p90': 90, 'p99': 99, 'max': 100})
+
+
+class TestServerPool(unittest.TestCase):
+
+    def test_swap_app(self):
+        s = http.StopableWSGIServer.create(debug_app)
+        try:
+            s.wait()
+            self.assertIs(s.swap_app(hello_app), debug_app)
+            self.assertEqual(get(s), (200, b'hello'))
+        finally:
+            s.shutdown()
+
+    def test_lease_and_release(self):
+        with http.ServerPool() as pool:
+            server = pool.lease(hello_app)
+            self.assertEqual(get(server), (200, b'hello'))
+            other = pool.lease(debug_app)
+            self.assertIsNot(other, server)
+            pool.release(server)
+            self.assertEqual(get(server)[0], 503)
+            self.assertRaises(ValueError, pool.release, server)
+            self.assertIs(pool.lease(debug_app), server)
+            self.assertEqual(get(server, '/?status=204')[0], 204)
+            pool.release(server)
+            pool.release(other)
+            self.assertEqual(len(pool.servers), 2)
+        self.assertTrue(server.was_shutdown)
+        self.assertTrue(other.was_shutdown)
+        self.assertRaises(RuntimeError, pool.lease, hello_app)
+
+    def test_release_foreign_server(self):
+        with http.ServerPool() as pool, http.ServerPool() as other_pool:
+            server = other_pool.lease(hello_app)
+            self.assertRaises(ValueError, pool.release, server)
+            self.assertEqual(get(server), (200, b'hello'))
+            other_pool.release(server)
+            server = other_pool.lease(hello_app)
+            other_pool.release(server)
+            server.swap_app(hello_app)
+            self.assertRaises(ValueError, other_pool.release, server)
+            self.assertEqual(get(server), (200, b'hello'))
+
+    def test_release_after_close(self):
+        pool = http.ServerPool()
+        server = pool.lease(hello_app)
+        pool.close()
+        self.assertFalse(server.was_shutdown)
+        pool.release(server)
+        self.assertTrue(server.was_shutdown)
+        self.assertRaises(ValueError, http.ServerPool().release, server)
+
+    def test_threads(self):
+        pool = http.ServerPool()
+        errors = []
+
+        def run():
+            try:
+                for i in range(5):
+                    server = pool.lease(hello_app)
+                    self.assertEqual(get(server), (200, b'hello'))
+                    pool.release(server)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+        threads = [threading.Thread(target=run) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        pool.close()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(pool.servers), 4)
+
+
+def pid_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode()]
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+class TestWorkers(unittest.TestCase):
+
+    def test_workers(self):
+        s = http.StopableWSGIServer.create(pid_app, workers=2)
+        try:
+            self.assertEqual(len(s.workers), 2)
+            self.assertTrue(s.wait())
+            self.assertEqual(s.workers_ready, 2)
+            self.assertIn(str(s.effective_port), s.application_url)
+            pids = set()
+            for i in range(10):
+                status, body = get(s)
+                self.assertEqual(status, 200)
+                pids.add(int(body))
+            self.assertTrue(pids <= set(s.workers), pids)
+            self.assertEqual(get(s, '/__application__')[0], 200)
+            self.assertRaises(RuntimeError, s.swap_app, hello_app)
+        finally:
+            workers = list(s.workers)
+            self.assertTrue(s.shutdown())
+        self.assertEqual(s.workers, [])
+        for pid in workers:
+            self.assertRaises(ChildProcessError, os.waitpid, pid, 0)
+
+    def test_workers_exit_with_parent(self):
+        code = (
+            'import os, sys\n'
+            'from webtest import http\n'
+            'from tests.test_http import pid_app\n'
+            's = http.StopableWSGIServer.create(pid_app, workers=2)\n'
+            'assert s.wait()\n'
+            'print(s.adj.host, s.adj.port, flush=True)\n'
+            'os._exit(0)\n')
+        proc = subprocess.Popen(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        # the workers share the pipe: don't wait for its end
+        host, port = proc.stdout.readline().decode().split()
+        proc.stdout.close()
+        self.assertEqual(proc.wait(), 0)
+        for i in range(50):
+            if not http.check_server(host, port, retries=1):
+                break
+            time.sleep(.05)
+        self.assertEqual(http.check_server(host, port, retries=1), 0)
+
+    def test_workers_do_not_keep_other_servers(self):
+        other = http.StopableWSGIServer.create(debug_app)
+        self.assertTrue(other.wait())
+        s = http.StopableWSGIServer.create(pid_app, workers=1)
+        try:
+            self.assertTrue(s.wait())
+            other.shutdown()
+            # the socket is released once the thread of the server stops
+            other.runner.join(5)
+            self.assertRaises(ConnectionRefusedError, socket.create_connection,
+                              (other.adj.host, other.adj.port), 3)
+        finally:
+            s.shutdown()
+
+    def test_no_pool_of_workers(self):
+        self.assertRaises(ValueError, http.ServerPool, workers=2)
+
+
+class TestUnixSocket(unittest.TestCase):
+
+    def test_urls(self):
+        url = http.unix_socket_url('/tmp/app dir/app.sock')
+        self.assertEqual(url, 'http+unix://%2Ftmp%2Fapp%20dir%2Fapp.sock/')
+        self.assertEqual(http.parse_unix_socket_url(url + 'prefix'),
+                         ('/tmp/app dir/app.sock', 'http://localhost/prefix'))
+        self.assertRaises(ValueError, http.parse_unix_socket_url,
+                          'http://localhost/')
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+    def test_server(self):
+        dirname = tempfile.mkdtemp()
+        path = os.path.join(dirname, 'app.sock')
+        try:
+            s = http.StopableWSGIServer.create(hello_app, unix_socket=path)
+            self.assertIsInstance(s, http.StopableUnixWSGIServer)
+            self.assertTrue(s.wait())
+            conn = http.UnixHTTPConnection(path, timeout=5)
+            conn.request('GET', '/')
+            self.assertEqual(conn.getresponse().read(), b'hello')
+            conn.close()
+            s.shutdown()
+            self.assertFalse(os.path.exists(path))
+            self.assertRaises(OSError, http.UnixHTTPConnection(path).connect)
+        finally:
+            shutil.rmtree(dirname)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+    def test_server_class(self):
+        class Server(http.StopableWSGIServer):
+            pass
+
+        class UnixServer(http.StopableUnixWSGIServer):
+            pass
+        dirname = tempfile.mkdtemp()
+        path = os.path.join(dirname, 'app.sock')
+        try:
+            self.assertRaises(TypeError, Server.create, hello_app,
+                              unix_socket=path)
+            s = UnixServer.create(hello_app, unix_socket=path)
+            self.assertIsInstance(s, UnixServer)
+            s.shutdown()
+        finally:
+            shutil.rmtree(dirname)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+    def test_workers(self):
+        dirname = tempfile.mkdtemp()
+        path = os.path.join(dirname, 'app.sock')
+        try:
+            s = http.StopableWSGIServer.create(pid_app, unix_socket=path,
+                                               workers=2)
+            self.assertTrue(s.wait())
+            conn = http.UnixHTTPConnection(path)
+            conn.request('GET', '/')
+            self.assertIn(int(conn.getresponse().read()), s.workers)
+            conn.close()
+            s.shutdown()
+            self.assertFalse(os.path.exists(path))
+        finally:
+            shutil.rmtree(dirname)
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.s = http.StopableWSGIServer.create(debug_app)
+        self.s.wait()
+        self.host = '%s:%s' % (self.s.adj.host, self.s.adj.port)
+
+    def tearDown(self):
+        self.s.shutdown()
+
+    def request(self, client, path='/', headers=None):
+        return client('http://%s%s' % (self.host, path), 'GET', None,
+                      headers or {})
+
+    def test_from_url(self):
+        url, client = http.HttpClient.from_url('http://localhost/#', 'pool')
+        self.assertEqual(client.pool_size, 10)
+        url, client = http.HttpClient.from_url(
+            'http+unix://%2Ftmp%2Fs/', 'pool:3')
+        self.assertEqual((url, client.unix_socket, client.pool_size),
+                         ('http://localhost/', '/tmp/s', 3))
+        url, client = http.HttpClient.from_url('http+unix://%2Ftmp%2Fs/',
+                                               'httplib')
+        self.assertIsNone(client.pool_size)
+        self.assertRaises(ValueError, http.HttpClient.from_url,
+                          'http+unix://%2Ftmp%2Fs/', 'requests')
+
+    def test_no_pool(self):
+        client = http.HttpClient()
+        status, location, headers, body = self.request(client)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(client.pools, {})
+
+    def test_pool(self):
+        client = http.HttpClient(pool_size=1)
+        self.request(client)
+        idle = client.pools[('http', self.host)]
+        self.assertEqual(len(idle), 1)
+        conn = idle[0]
+        status, location, headers, body = self.request(client,
+                                                       '/?status=302')
+        self.assertEqual(status, '302 Found')
+        self.assertEqual(idle, [conn])
+        client.close()
+        self.assertEqual(client.pools, {})
+        self.assertIsNone(conn.sock)
+
+    def test_connection_close(self):
+        client = http.HttpClient(pool_size=1)
+        status = self.request(client, headers={'Connection': 'close'})[0]
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(client.pools, {})
+
+    def test_testapp_pool(self):
+        app = webtest.TestApp(self.s.application_url + '#pool:2')
+        self.assertEqual(app.app.http.pool_size, 2)
+        app.get('/')
+        app.post('/', {'a': 'b'}).mustcontain('a=b')
+        self.assertEqual(len(app.app.http.pools[('http', self.host)]), 1)
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+class TestHttpClientReconnect(unittest.TestCase):
+
+    def test_reconnect(self):
+        dirname = tempfile.mkdtemp()
+        path = os.path.join(dirname, 'app.sock')
+        client = http.HttpClient(unix_socket=path, pool_size=2)
+        try:
+            s = http.StopableWSGIServer.create(hello_app, unix_socket=path)
+            s.wait()
+            uri = 'http://localhost/'
+            self.assertEqual(client(uri, 'GET', None, {})[3], [b'hello'])
+            s.shutdown()
+            s = http.StopableWSGIServer.create(hello_app, unix_socket=path)
+            s.wait()
+            # the pooled connection was closed by the first server
+            self.assertEqual(client(uri, 'GET', None, {})[3], [b'hello'])
+            s.shutdown()
+            self.assertRaises(OSError, client, uri, 'GET', None, {})
+        finally:
+            client.close()
+            shutil.rmtree(dirname)
@@ -7,16 +7,22 @@ from unittest import mock
 from io import StringIO
 
 from webtest import TestApp
+from webtest import lint
 from webtest.compat import to_bytes
 from webtest.lint import check_headers
 from webtest.lint import check_content_type
 from webtest.lint import check_environ
+from webtest.lint import check_errors
+from webtest.lint import check_input
 from webtest.lint import IteratorWrapper
 from webtest.lint import WriteWrapper
 from webtest.lint import ErrorWrapper
 from webtest.lint import InputWrapper
 from webtest.lint import to_string
 from webtest.lint import middleware
+from webtest.lint import LintMiddleware
+from webtest.lint import LintPolicy
+from webtest.lint import StartResponseWrapper
 from webtest.lint import _assert_latin1_str
 
 from io import BytesIO
@@ -59,7 +65,8 @@ class TestToString(unittest.TestCase):
 
 class TestMiddleware(unittest.TestCase):
 
-    @unittest.skipIf(sys.flags.optimize > 0, "skip assert tests if optimize is enabled")
+    @unittest.skipIf(sys.flags.optimize > 0,
+                     "skip assert tests if optimize is enabled")
     def test_lint_too_few_args(self):
         linter = middleware(application)
         with self.assertRaisesRegex(AssertionError, "Two arguments required"):
@@ -67,14 +74,48 @@ class TestMiddleware(unittest.TestCase):
         with self.assertRaisesRegex(AssertionError, "Two arguments required"):
             linter({})
 
-    @unittest.skipIf(sys.flags.optimize > 0, "skip assert tests if optimize is enabled")
+    @unittest.skipIf(sys.flags.optimize > 0,
+                     "skip assert tests if optimize is enabled")
     def test_lint_no_keyword_args(self):
         linter = middleware(application)
         with self.assertRaisesRegex(AssertionError, "No keyword arguments "
                                                      "allowed"):
             linter({}, 'foo', baz='baz')
 
-    # TODO: test start_response_wrapper
+    def test_start_response_wrapper(self):
+        calls = []
+        wrapper = StartResponseWrapper(lambda *args: calls.append(args))
+        self.assertFalse(wrapper)
+        write = wrapper('200 OK', [('Content-Type', 'text/plain')])
+        self.assertTrue(wrapper)
+        self.assertIsInstance(write, WriteWrapper)
+        self.assertEqual(calls, [('200 OK', [('Content-Type', 'text/plain')])])
+
+    @unittest.skipIf(sys.flags.optimize > 0,
+                     "skip assert tests if optimize is enabled")
+    def test_start_response_wrapper_args(self):
+        wrapper = StartResponseWrapper(None)
+        with self.assertRaisesRegex(AssertionError, "Invalid number"):
+            wrapper('200 OK')
+        with self.assertRaisesRegex(AssertionError, "No keyword"):
+            wrapper('200 OK', [], exc_info=None)
+
+    def test_middleware_is_reused(self):
+        app = TestApp(application)
+        app.get('/')
+        linter = app._lint_app
+        self.assertIsInstance(linter, LintMiddleware)
+        self.assertIs(linter.application.application, application)
+        app.get('/')
+        self.assertIs(app._lint_app, linter)
+
+        def other_application(environ, start_response):
+            return application(environ, start_response)
+        app.app = other_application
+        app.get('/')
+        self.assertIsNot(app._lint_app, linter)
+        self.assertIs(app._lint_app.application.application,
+                      other_application)
 
     @mock.patch.multiple('webtest.lint',
                          check_environ=lambda x: True,  # don't block too early
@@ -170,6 +211,30 @@ class TestCheckHeaders(unittest.TestCase):
         headers = [('X-€', 'foo')]
         self.assertRaises(AssertionError, check_headers, headers)
 
+    def test_header_errors(self):
+        for headers, message in [
+                ([('Status', '200 OK')], 'The Status header cannot be used'),
+                ([('X:Price', '100')], "Header names may not contain"),
+                ([('X Price', '100')], 'Bad header name'),
+                ([('X-Price-', '100')], "Names may not end in '-' or '_'"),
+                ([('X-Price', '100\r\n')], 'Bad header value'),
+                ([('X-Price', '100', 'EUR')], ''),
+                ((('X-Price', '100'),), 'must be of type list'),
+                ([['X-Price', '100']], 'must be of type tuple')]:
+            with self.assertRaisesRegex(AssertionError, message):
+                check_headers(headers)
+
+    def test_many_headers(self):
+        headers = [('Set-Cookie', 'c%d=%d; Path=/' % (i, i))
+                   for i in range(30)]
+        headers.extend([('Content-Type', 'text/plain'),
+                        ('Content-Length', '4'),
+                        ('X-Latin1', 'caf\xe9\x7f')])
+        check_headers(headers)
+        check_content_type('200 OK', headers)
+        self.assertRaises(AssertionError, check_content_type,
+                          '200 OK', headers[:30] + headers[31:])
+
 
 class TestCheckEnviron(unittest.TestCase):
     def test_no_query_string(self):
@@ -240,6 +305,33 @@ class TestCheckEnviron(unittest.TestCase):
             self.assertEqual(0, len(w), "We should have no warning")
 
 
+class TestCheckStreams(unittest.TestCase):
+
+    def test_check_input(self):
+        check_input(BytesIO())
+        self.assertIn(BytesIO, lint._valid_input_types)
+        self.assertRaisesRegex(AssertionError,
+                               "doesn't have the attribute readline",
+                               check_input, mock.Mock(spec=['read']))
+
+    def test_check_errors(self):
+        check_errors(StringIO())
+        self.assertIn(StringIO, lint._valid_errors_types)
+        self.assertRaisesRegex(AssertionError,
+                               "doesn't have the attribute write",
+                               check_errors, mock.Mock(spec=['flush']))
+
+    def test_instance_attributes_are_checked_every_time(self):
+        class Stream:
+            def flush(self):
+                pass
+        stream = Stream()
+        stream.write = stream.writelines = stream.flush
+        check_errors(stream)
+        self.assertNotIn(Stream, lint._valid_errors_types)
+        self.assertRaises(AssertionError, check_errors, Stream())
+
+
 class TestIteratorWrapper(unittest.TestCase):
     def test_close(self):
         class MockIterator:
@@ -267,7 +359,8 @@ class TestIteratorWrapper(unittest.TestCase):
 
 class TestWriteWrapper(unittest.TestCase):
 
-    @unittest.skipIf(sys.flags.optimize > 0, "skip assert tests if optimize is enabled")
+    @unittest.skipIf(sys.flags.optimize > 0,
+                     "skip assert tests if optimize is enabled")
     def test_wrong_type(self):
         write_wrapper = WriteWrapper(None)
         self.assertRaises(AssertionError, write_wrapper, 'not a binary')
@@ -326,3 +419,220 @@ class TestErrorWrapper(unittest.TestCase):
         self.assertTrue(
             fake_error.flushed,
             "ErrorWrapper should have called original wsgi_errors's flush")
+
+
+def simple_application(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+class TestLintPolicy(unittest.TestCase):
+
+    def linted(self, app, url, count=20):
+        linted = 0
+        for i in range(count):
+            resp = app.get(url)
+            linted += isinstance(resp.app, LintMiddleware)
+        return linted
+
+    def test_from_string(self):
+        policy = LintPolicy.from_string('sample:0.05')
+        self.assertEqual(policy.sample, .05)
+        self.assertEqual(repr(policy), '<LintPolicy sample=0.05 seed=0>')
+        self.assertRaises(ValueError, LintPolicy.from_string, 'sample')
+        self.assertRaises(ValueError, LintPolicy.from_string, 'sample:x')
+        self.assertRaises(ValueError, LintPolicy.from_string, 'strict')
+        self.assertRaises(ValueError, LintPolicy, sample=2)
+
+    def test_testapp_lint_values(self):
+        app = TestApp(simple_application)
+        self.assertIs(app.lint, True)
+        app.lint = 0
+        self.assertIs(app.lint, False)
+        app.lint = 'sample:0.5'
+        self.assertIsInstance(app.lint, LintPolicy)
+        policy = LintPolicy()
+        app = TestApp(simple_application, lint=policy)
+        self.assertIs(app.lint, policy)
+
+    def test_sample_all(self):
+        app = TestApp(simple_application, lint=LintPolicy(sample=1))
+        self.assertEqual(self.linted(app, '/'), 20)
+
+    def test_first_request_per_route(self):
+        app = TestApp(simple_application, lint=LintPolicy(sample=0))
+        self.assertEqual(self.linted(app, '/'), 1)
+        self.assertEqual(self.linted(app, '/?a=b'), 0)
+        self.assertEqual(self.linted(app, '/other'), 1)
+        resp = app.post('/')
+        self.assertIsInstance(resp.app, LintMiddleware)
+
+    def test_sample_is_deterministic(self):
+        app1 = TestApp(simple_application, lint='sample:0.5')
+        app2 = TestApp(simple_application, lint='sample:0.5')
+        linted = self.linted(app1, '/', 200)
+        self.assertEqual(self.linted(app2, '/', 200), linted)
+        self.assertTrue(50 < linted < 150, linted)
+        app3 = TestApp(simple_application, lint=LintPolicy(sample=0.5, seed=1))
+        results = [self.linted(app3, '/', 1) for i in range(200)]
+        app4 = TestApp(simple_application, lint=LintPolicy(sample=0.5, seed=1))
+        self.assertEqual([self.linted(app4, '/', 1) for i in range(200)],
+                         results)
+
+
+def bad_application(environ, start_response):
+    start_response('200 OK', [('Content-Length', '4'), ('X-Bad-', 'x')])
+    return [b'oops']
+
+
+def no_content_application(environ, start_response):
+    # the headers are changed after start_response
+    headers = [('Content-Type', 'text/plain')]
+    start_response('304 Not Modified', headers)
+    headers.pop()
+    return []
+
+
+class TestLintCollect(unittest.TestCase):
+
+    def test_from_string(self):
+        policy = LintPolicy.from_string('collect, sample:0.5')
+        self.assertTrue(policy.collect)
+        self.assertEqual(policy.sample, .5)
+        self.assertEqual(repr(policy),
+                         '<LintPolicy sample=0.5 seed=0 collect>')
+        self.assertRaises(ValueError, LintPolicy.from_string, 'collect:1')
+
+    def test_no_violations(self):
+        app = TestApp(simple_application, lint='collect')
+        resp = app.get('/')
+        self.assertFalse(resp.lint_report)
+        self.assertEqual(str(resp.lint_report), '')
+        self.assertNotIn('webtest.lint_report',
+                         TestApp(simple_application).get('/').request.environ)
+        self.assertFalse(hasattr(TestApp(simple_application).get('/'),
+                                 'lint_report'))
+        self.assertEqual(app.lint_summary.requests, 1)
+        self.assertFalse(app.lint_summary)
+
+    def test_collect(self):
+        self.assertRaises(AssertionError,
+                          TestApp(bad_application).get, '/')
+        app = TestApp(bad_application, lint='collect')
+        resp = app.get('/')
+        self.assertEqual(resp.body, b'oops')
+        report = resp.lint_report
+        self.assertEqual([v.rule for v in report], ['headers'])
+        self.assertEqual(len(report.errors), 1)
+        self.assertIn("Names may not end in '-' or '_'", str(report))
+
+        app.get('/')
+        app.get('/other')
+        summary = app.lint_summary
+        self.assertEqual(summary.requests, 3)
+        self.assertEqual(summary.rules, {'headers': 3})
+        self.assertEqual(summary.routes, {('GET', '/'): 2,
+                                          ('GET', '/other'): 1})
+        self.assertIn('3 violations in 3 requests', str(summary))
+        self.assertIn('GET /other', str(summary))
+        summary.reset()
+        self.assertFalse(summary)
+
+    def test_collect_environ(self):
+        app = TestApp(simple_application, lint='collect')
+        resp = app.request('/', method='PROPFIND')
+        self.assertEqual([(v.rule, v.level) for v in resp.lint_report],
+                         [('environ', 'warning')])
+
+    def test_deferred_checks_use_the_original_headers(self):
+        app = TestApp(no_content_application, lint='collect')
+        resp = app.get('/', status=304)
+        self.assertEqual(resp.lint_report.warnings[0].rule, 'content_type')
+        self.assertIn('Content-Type header found in a 304 response',
+                      resp.lint_report.warnings[0].message)
+
+    def test_lint_summary_without_collect(self):
+        self.assertIsNone(TestApp(simple_application).lint_summary)
+        self.assertIsNone(
+            TestApp(simple_application, lint='sample:0.5').lint_summary)
+
+
+def slow_application(environ, start_response):
+    # everything the performance rules are about
+    wsgi_input = environ['wsgi.input']
+    while wsgi_input.read(1):
+        pass
+    write = start_response('200 OK', [('Content-Type', 'text/html')])
+    write(b'<html>')
+    return [b'x' * 10] * 8000
+
+
+class TestPerformanceRules(unittest.TestCase):
+
+    def test_from_string(self):
+        policy = LintPolicy.from_string('performance,collect')
+        self.assertTrue(policy.performance)
+        self.assertEqual(repr(policy),
+                         '<LintPolicy sample=1.0 seed=0 collect performance>')
+
+    def test_disabled_by_default(self):
+        app = TestApp(slow_application)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', lint.PerformanceWarning)
+            app.post('/', b'x' * 100)
+        self.assertFalse(app.get('/').app.performance)
+
+    def test_warnings(self):
+        app = TestApp(slow_application, lint='performance')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', lint.PerformanceWarning)
+            app.post('/', b'x' * 100,
+                     headers={'Accept-Encoding': 'gzip, deflate'})
+        messages = [str(w.message) for w in caught
+                    if w.category is lint.PerformanceWarning]
+        self.assertEqual(len(messages), 5, messages)
+        self.assertIn('8000 chunks smaller than 256 bytes', messages[0])
+        self.assertIn('one byte at a time (101 reads)', messages[1])
+        self.assertIn('called 1 times', messages[2])
+        self.assertIn('but no Content-Length header', messages[3])
+        self.assertIn('text/html response has 80000 bytes', messages[4])
+
+    def test_collect(self):
+        app = TestApp(slow_application, lint='performance,collect')
+        resp = app.post('/', b'x' * 10)
+        self.assertEqual(
+            [(v.rule, v.level) for v in resp.lint_report],
+            [('tiny_chunks', 'warning'), ('write', 'warning'),
+             ('content_length', 'warning')])
+        self.assertEqual(app.lint_summary.rules['write'], 1)
+
+    def test_line_reads(self):
+        def app(environ, start_response):
+            lines = list(environ['wsgi.input'])
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'%d' % len(lines)]
+        app = TestApp(app, lint='performance,collect')
+        resp = app.post('/', b'x\n' * 100)
+        self.assertEqual(resp.body, b'100')
+        self.assertEqual([v.rule for v in resp.lint_report],
+                         ['input_reads'])
+        self.assertIn('one line at a time (101 reads)',
+                      resp.lint_report.violations[0].message)
+
+    def test_good_application(self):
+        def app(environ, start_response):
+            body = b'x' * 100000
+            start_response('200 OK', [('Content-Type', 'text/plain'),
+                                      ('Content-Length', str(len(body)))])
+            return [body[:50000], body[50000:]]
+        app = TestApp(app, lint='performance,collect')
+        resp = app.get('/')
+        self.assertFalse(resp.lint_report)
+        resp = app.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual([v.rule for v in resp.lint_report], ['compression'])
+
+    def test_switching_policy_rebuilds_middleware(self):
+        app = TestApp(simple_application)
+        self.assertFalse(app.get('/').app.performance)
+        app.lint = 'performance'
+        self.assertTrue(app.get('/').app.performance)
@@ -0,0 +1,93 @@
+from tests.compat import unittest
+from webob import Request
+from webtest import perf
+
+
+class TestMatchPath(unittest.TestCase):
+
+    def test_boolean(self):
+        self.assertTrue(perf.match_path(True, '/'))
+        self.assertFalse(perf.match_path(False, '/'))
+        self.assertFalse(perf.match_path(None, '/'))
+
+    def test_patterns(self):
+        self.assertTrue(perf.match_path('/reports/*', '/reports/daily'))
+        self.assertFalse(perf.match_path('/reports/*', '/report'))
+        self.assertTrue(perf.match_path(['/a', '/b/*'], '/b/c'))
+        self.assertFalse(perf.match_path(['/a', '/b/*'], '/c'))
+
+
+class TestProfileFilename(unittest.TestCase):
+
+    def test_profile_filename(self):
+        req = Request.blank('/reports/daily report.csv')
+        filename = perf.profile_filename(req)
+        self.assertTrue(
+            filename.endswith('-GET-reports_daily_report.csv.prof'), filename)
+        self.assertNotEqual(filename, perf.profile_filename(req))
+
+
+class TestParseSize(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(perf.parse_size(12), 12)
+        self.assertEqual(perf.parse_size(5e6), 5000000)
+        self.assertEqual(perf.parse_size('12'), 12)
+        self.assertEqual(perf.parse_size('1k'), 1024)
+        self.assertEqual(perf.parse_size('1.5 KB'), 1536)
+        self.assertEqual(perf.parse_size('50MB'), 50 * 1024 ** 2)
+        self.assertEqual(perf.parse_size('2GiB'), 2 * 1024 ** 3)
+        self.assertRaises(ValueError, perf.parse_size, '12 apples')
+
+    def test_format_size(self):
+        self.assertEqual(perf.format_size(12), '12 B')
+        self.assertEqual(perf.format_size(1536), '1.5 KB')
+        self.assertEqual(perf.format_size(50 * 1024 ** 2), '50.0 MB')
+        self.assertEqual(perf.format_size(3 * 1024 ** 3), '3.0 GB')
+
+
+class TestMemoryTracker(unittest.TestCase):
+
+    def test_memory_tracker(self):
+        tracker = perf.MemoryTracker()
+        tracker.start()
+        data = [bytearray(1024) for i in range(1024)]
+        report = tracker.stop()
+        self.assertGreater(report.peak, 1024 * 1024)
+        self.assertTrue(report.retained)
+        self.assertIn('test_perf.py', str(report))
+        self.assertTrue(repr(report).startswith('<MemoryReport peak='))
+        del data
+
+
+class TestRequestTimer(unittest.TestCase):
+
+    def test_request_timer(self):
+        totals = perf.Timings()
+        timer = perf.RequestTimer(totals)
+        timer.lap('environ')
+        timer.mark()
+        timer.lap('app')
+        timer.add('html', timer.started)
+        timer.add('html', 1.0, 1.5)
+        self.assertEqual([phase for phase, start, end in timer.phases],
+                         ['environ', 'app', 'html', 'html'])
+        self.assertGreaterEqual(timer.durations['html'], .5)
+        self.assertEqual(totals.phases['html'][0], 2)
+        self.assertIn('html                    2', timer.table())
+
+    def test_request_timer_without_totals(self):
+        timer = perf.RequestTimer()
+        timer.lap('app')
+        self.assertEqual(list(timer.durations), ['app'])
+
+
+class TestParseDuration(unittest.TestCase):
+
+    def test_parse_duration(self):
+        self.assertEqual(perf.parse_duration(2), 2)
+        self.assertEqual(perf.parse_duration(.5), .5)
+        self.assertEqual(perf.parse_duration('1.5'), 1.5)
+        self.assertEqual(perf.parse_duration('1.5s'), 1.5)
+        self.assertEqual(perf.parse_duration('200ms'), .2)
+        self.assertRaises(ValueError, perf.parse_duration, '2 days')
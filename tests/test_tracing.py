@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from unittest import mock
+
+from tests.compat import unittest
+from webtest.debugapp import debug_app
+from webtest import tracing
+import webtest
+
+
+class TestTraceparent(unittest.TestCase):
+
+    def test_parse_traceparent(self):
+        trace_id = '0af7651916cd43dd8448eb211c80319c'
+        self.assertEqual(
+            tracing.parse_traceparent('00-%s-b7ad6b7169203331-01' % trace_id),
+            (trace_id, 'b7ad6b7169203331'))
+        self.assertIsNone(tracing.parse_traceparent('00-123-456-01'))
+
+    def test_attributes(self):
+        self.assertEqual(
+            tracing.attributes(http_response_status_code=200,
+                               url_full='http://localhost/',
+                               error_type=None, retried=False),
+            [{'key': 'http.response.status.code',
+              'value': {'intValue': '200'}},
+             {'key': 'retried', 'value': {'boolValue': False}},
+             {'key': 'url.full',
+              'value': {'stringValue': 'http://localhost/'}}])
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = tracing.InMemoryExporter()
+        self.app = webtest.TestApp(debug_app, trace=self.exporter)
+
+    def test_spans(self):
+        resp = self.app.get('/path')
+        root = self.exporter.spans[0]
+        self.assertEqual(root['name'], 'GET /path')
+        self.assertEqual(root['kind'], tracing.SPAN_KIND_CLIENT)
+        self.assertNotIn('parentSpanId', root)
+        self.assertEqual(
+            [span['name'] for span in self.exporter.spans[1:]],
+            ['environ', 'cookie_header', 'lint', 'app', 'lint', 'app_iter',
+             'lint', 'decode_content', 'cookie_extract'])
+        for span in self.exporter.spans[1:]:
+            self.assertEqual(span['traceId'], root['traceId'])
+            self.assertEqual(span['parentSpanId'], root['spanId'])
+            self.assertLessEqual(int(root['startTimeUnixNano']),
+                                 int(span['startTimeUnixNano']))
+            self.assertLessEqual(int(span['startTimeUnixNano']),
+                                 int(span['endTimeUnixNano']))
+            self.assertLessEqual(int(span['endTimeUnixNano']),
+                                 int(root['endTimeUnixNano']))
+        app_span = self.exporter.spans[4]
+        resp.mustcontain('HTTP_TRACEPARENT: 00-%s-%s-01' % (
+            root['traceId'], app_span['spanId']))
+
+    def test_app_span_excludes_lint(self):
+        with mock.patch('webtest.lint.check_environ',
+                        side_effect=lambda environ: time.sleep(.05)):
+            self.app.get('/')
+
+        def seconds(span):
+            return (int(span['endTimeUnixNano']) -
+                    int(span['startTimeUnixNano'])) / 1e9
+        app_span, = [span for span in self.exporter.spans
+                     if span['name'] == 'app']
+        self.assertLess(seconds(app_span), .05)
+        self.assertGreaterEqual(
+            sum(seconds(span) for span in self.exporter.spans
+                if span['name'] == 'lint'), .05)
+
+    def test_parent_traceparent(self):
+        trace_id = '0af7651916cd43dd8448eb211c80319c'
+        self.app.get('/', headers={
+            'traceparent': '00-%s-b7ad6b7169203331-01' % trace_id})
+        root = self.exporter.spans[0]
+        self.assertEqual(root['traceId'], trace_id)
+        self.assertEqual(root['parentSpanId'], 'b7ad6b7169203331')
+
+    def test_error_span(self):
+        self.assertRaises(webtest.AppError, self.app.get, '/?status=500')
+        root = self.exporter.spans[0]
+        self.assertEqual(root['status']['code'], tracing.STATUS_CODE_ERROR)
+        self.assertIn({'key': 'error.type',
+                       'value': {'stringValue': 'AppError'}},
+                      root['attributes'])
+        self.exporter.clear()
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_app_error_span(self):
+        traceparents = []
+
+        def app(environ, start_response):
+            traceparents.append(environ['HTTP_TRACEPARENT'])
+            raise ValueError('Boom')
+        app = webtest.TestApp(app, trace=self.exporter)
+        self.assertRaises(ValueError, app.get, '/')
+        names = [span['name'] for span in self.exporter.spans]
+        self.assertEqual(names, ['GET /', 'environ', 'cookie_header', 'lint',
+                                 'app'])
+        root, app_span = self.exporter.spans[0], self.exporter.spans[-1]
+        self.assertEqual(traceparents, ['00-%s-%s-01' % (
+            root['traceId'], app_span['spanId'])])
+        self.assertEqual(app_span['parentSpanId'], root['spanId'])
+        self.assertEqual(app_span['status'],
+                         {'code': tracing.STATUS_CODE_ERROR,
+                          'message': 'Boom'})
+        self.assertEqual(app_span['attributes'], tracing.attributes(
+            exception_type='ValueError', exception_message='Boom'))
+        # the other phases have no error
+        self.assertEqual(self.exporter.spans[1]['status'],
+                         {'code': tracing.STATUS_CODE_UNSET})
+
+    def test_json_lines_exporter(self):
+        dirname = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dirname)
+        filename = os.path.join(dirname, 'spans.jsonl')
+        app = webtest.TestApp(debug_app, trace=filename)
+        app.get('/')
+        app.post('/')
+        with open(filename) as fd:
+            spans = [json.loads(line) for line in fd]
+        self.assertEqual([span['name'] for span in spans
+                          if 'parentSpanId' not in span],
+                         ['GET /', 'POST /'])
@@ -10,21 +10,31 @@ Most interesting is TestApp
 
 import os
 import re
+import copy
 import json
+import cProfile
 import random
 import fnmatch
 import mimetypes
 
 from base64 import b64encode
+from time import perf_counter
 from http import cookiejar as http_cookiejar
 from io import BytesIO, StringIO
 
 from webtest.compat import urlparse
 from webtest.compat import to_bytes
 from webtest.compat import escape_cookie_value
+from webtest.cookiejar import CookieJar
+from webtest.cookiejar import CookiePolicy  # NOQA
+from webtest.cookiejar import copy_cookiejar
+from webtest.cookiejar import cookie_from_dict
+from webtest.cookiejar import cookie_to_dict
 from webtest.response import TestResponse
 from webtest import forms
 from webtest import lint
+from webtest import perf
+from webtest import tracing
 from webtest import utils
 
 import webob
@@ -57,23 +67,6 @@ class AppError(Exception):
         Exception.__init__(self, message)
 
 
-class CookiePolicy(http_cookiejar.DefaultCookiePolicy):
-    """A subclass of DefaultCookiePolicy to allow cookie set for
-    Domain=localhost."""
-
-    def return_ok_domain(self, cookie, request):
-        if cookie.domain == '.localhost':
-            return True
-        return http_cookiejar.DefaultCookiePolicy.return_ok_domain(
-            self, cookie, request)
-
-    def set_ok_domain(self, cookie, request):
-        if cookie.domain == '.localhost':
-            return True
-        return http_cookiejar.DefaultCookiePolicy.set_ok_domain(
-            self, cookie, request)
-
-
 class TestRequest(webob.BaseRequest):
     """A subclass of webob.Request"""
 
@@ -97,7 +90,10 @@ class TestApp:
 
         It can also be an actual full URL to an http server and webtest
         will proxy requests with `WSGIProxy2
-        <https://pypi.org/project/WSGIProxy2/>`_.
+        <https://pypi.org/project/WSGIProxy2/>`_. A server listening on a
+        unix socket can be reached with a ``http+unix://`` URL where the
+        path of the socket is quoted, like
+        ``'http+unix://%2Ftmp%2Fapp.sock/'``.
     :type app:
         WSGI application
     :param extra_environ:
@@ -114,7 +110,7 @@ class TestApp:
         string
     :param cookiejar:
         :class:`cookielib.CookieJar` alike API that keeps cookies
-        across requests.
+        across requests. Defaults to a :class:`webtest.cookiejar.CookieJar`.
     :type cookiejar:
         CookieJar instance
 
@@ -132,19 +128,55 @@ class TestApp:
     :type json_encoder:
         A subclass of json.JSONEncoder
     :param lint:
-        If True (default) then check that the application is WSGI compliant
+        If True (default) then check that the application is WSGI compliant.
+        A :class:`webtest.lint.LintPolicy`, or a string like
+        ``'sample:0.05'``, only checks some of the requests. ``'collect'``
+        records the violations in ``res.lint_report`` instead of failing.
     :type lint:
-        A boolean
+        A boolean, string or :class:`webtest.lint.LintPolicy`
+    :param profile:
+        Run the application under :mod:`cProfile` for matching requests.
+        Can be True (all requests), a shell-style wildcard matched against
+        the path like ``'/reports/*'``, or a list of wildcards. See the
+        ``profile`` argument of :meth:`~webtest.TestApp.get`.
+    :type profile:
+        boolean, string or list
+    :param profile_dir:
+        If given, the profile of each profiled request is also dumped in
+        this directory, one ``.prof`` file per request.
+    :type profile_dir:
+        string
+    :param timings:
+        If True, the time spent in each phase of the requests (building
+        the environ, lint, the application, cookies, decoding and parsing
+        the response...) is recorded. Per-request timings are available as
+        ``res.timings`` and cumulative ones as ``app.timings``. See
+        :class:`webtest.perf.Timings`.
+    :type timings:
+        boolean or :class:`webtest.perf.Timings`
+    :param trace:
+        Export a span for each request, and for each of its phases, to
+        this exporter. A string is used as the path of a JSON lines file.
+        A W3C ``traceparent`` header is added to the requests so the spans
+        of the application nest underneath. See :mod:`webtest.tracing`.
+    :type trace:
+        string, :class:`webtest.tracing.InMemoryExporter` or
+        :class:`webtest.tracing.JsonLinesExporter`
     """
 
     RequestClass = TestRequest
 
+    #: Name of the ``paste.testing_variables`` entry read to check the
+    #: ``max_queries`` budget of a request
+    queries_variable = 'queries'
+
     # Tell pytest not to collect this class as tests
     __test__ = False
 
     def __init__(self, app, extra_environ=None, relative_to=None,
                  use_unicode=True, cookiejar=None, parser_features=None,
-                 json_encoder=None, lint=True):
+                 json_encoder=None, lint=True, profile=False,
+                 profile_dir=None, timings=False, trace=None):
 
         if 'WEBTEST_TARGET_URL' in os.environ:
             app = os.environ['WEBTEST_TARGET_URL']
@@ -160,6 +192,10 @@ class TestApp:
                 if '#' not in app:
                     app += '#httplib'
                 url, client = app.split('#', 1)
+                if url.startswith('http+unix://') or \
+                        client.partition(':')[0] == 'pool':
+                    from webtest.http import HttpClient
+                    url, client = HttpClient.from_url(url, client)
                 app = HostProxy(url, client=client)
             else:
                 from paste.deploy import loadapp
@@ -168,13 +204,21 @@ class TestApp:
                 app = loadapp(app, relative_to=relative_to)
         self.app = app
         self.lint = lint
+        self.profile = profile
+        self.profile_dir = profile_dir
+        if timings is True:
+            timings = perf.Timings()
+        self.timings = timings or None
+        if isinstance(trace, str):
+            trace = tracing.JsonLinesExporter(trace)
+        self.trace = trace
         self.relative_to = relative_to
         if extra_environ is None:
             extra_environ = {}
         self.extra_environ = extra_environ
         self.use_unicode = use_unicode
         if cookiejar is None:
-            cookiejar = http_cookiejar.CookieJar(policy=CookiePolicy())
+            cookiejar = CookieJar()
         self.cookiejar = cookiejar
         if parser_features is None:
             parser_features = 'html.parser'
@@ -182,6 +226,7 @@ class TestApp:
         if json_encoder is None:
             json_encoder = json.JSONEncoder
         self.JSONEncoder = json_encoder
+        self._hooks = {}
 
     def get_authorization(self):
         """Allow to set the HTTP_AUTHORIZATION environ key. Value should look
@@ -226,6 +271,64 @@ class TestApp:
 
     authorization = property(get_authorization, set_authorization)
 
+    hook_events = ('before_request', 'after_response', 'on_error')
+
+    def add_hook(self, event, hook):
+        """
+        Register ``hook`` to be called by
+        :meth:`~webtest.TestApp.do_request` on ``event``:
+
+        * ``before_request``: called as ``hook(req)`` before anything is
+          done with the request, which can still be modified.
+
+        * ``after_response``: called as ``hook(req, res)`` once the response
+          is complete, before its status is checked.
+
+        * ``on_error``: called as ``hook(req, exc)`` when an exception,
+          including an :class:`~webtest.AppError` raised by the status
+          checks, is raised while processing the request.
+
+        Requests don't pay anything for hooks when none are registered.
+        """
+        if event not in self.hook_events:
+            raise ValueError('Unknown hook event %r, use one of %s' % (
+                event, ', '.join(self.hook_events)))
+        self._hooks.setdefault(event, []).append(hook)
+
+    def remove_hook(self, event, hook):
+        """
+        Unregister a ``hook`` registered with
+        :meth:`~webtest.TestApp.add_hook`.
+        """
+        hooks = self._hooks.get(event, [])
+        hooks.remove(hook)
+        if not hooks:
+            del self._hooks[event]
+
+    @property
+    def lint(self):
+        """True, False or the :class:`~webtest.lint.LintPolicy` deciding
+        which requests are checked for WSGI compliance"""
+        return self._lint
+
+    @lint.setter
+    def lint(self, value):
+        if isinstance(value, str):
+            value = lint.LintPolicy.from_string(value)
+        elif not isinstance(value, lint.LintPolicy):
+            value = bool(value)
+        self._lint = value
+        self._lint_app = None
+        self._timed_app = None
+
+    @property
+    def lint_summary(self):
+        """The :class:`~webtest.lint.LintSummary` of the violations found
+        when linting in collect mode, else None"""
+        if isinstance(self._lint, lint.LintPolicy):
+            return self._lint.summary
+        return None
+
     @property
     def cookies(self):
         return {cookie.name: cookie.value for cookie in self.cookiejar}
@@ -235,12 +338,32 @@ class TestApp:
         Sets a cookie to be passed through with requests.
 
         """
+        self.cookiejar.set_cookie(
+            self._make_cookie(name, value, self._cookie_domain()))
+
+    def set_cookies(self, cookies):
+        """
+        Sets several cookies to be passed through with requests. ``cookies``
+        is a dict or a list of ``(name, value)`` pairs.
+
+        """
+        if hasattr(cookies, 'items'):
+            cookies = cookies.items()
+        cookie_domain = self._cookie_domain()
+        cookiejar = self.cookiejar
+        for name, value in cookies:
+            cookiejar.set_cookie(self._make_cookie(name, value, cookie_domain))
+
+    def _cookie_domain(self):
         cookie_domain = self.extra_environ.get('HTTP_HOST', '.localhost')
         cookie_domain = cookie_domain.split(':', 1)[0]
         if '.' not in cookie_domain:
             cookie_domain = "%s.local" % cookie_domain
+        return cookie_domain
+
+    def _make_cookie(self, name, value, cookie_domain):
         value = escape_cookie_value(value)
-        cookie = http_cookiejar.Cookie(
+        return http_cookiejar.Cookie(
             version=0,
             name=name,
             value=value,
@@ -258,7 +381,6 @@ class TestApp:
             comment_url=None,
             rest=None
         )
-        self.cookiejar.set_cookie(cookie)
 
     def reset(self):
         """
@@ -267,6 +389,78 @@ class TestApp:
         """
         self.cookiejar.clear()
 
+    def fork(self):
+        """
+        Return a new :class:`TestApp` starting from the current state of
+        this one, for example to branch several scenarios from a logged in
+        session::
+
+            app.post('/login', {'user': 'bob', 'password': 'secret'})
+            admin = app.fork()
+            admin.get('/admin/')
+
+        The application, its lint middleware and the profiling, timings,
+        tracing and lint settings are shared. The cookies, ``extra_environ``,
+        authorization and hooks are copied so changes in one of the apps
+        are not seen by the other. The cookies of a
+        :class:`webtest.cookiejar.CookieJar` are only copied when one of
+        the jars is changed.
+        """
+        app = copy.copy(self)
+        app.extra_environ = dict(self.extra_environ)
+        app.cookiejar = copy_cookiejar(self.cookiejar)
+        app._hooks = {event: list(hooks)
+                      for event, hooks in self._hooks.items()}
+        return app
+
+    session_version = 1
+
+    def save_session(self, path):
+        """
+        Save the cookies, ``extra_environ`` and authorization to the JSON
+        file at ``path``, to be restored with :meth:`load_session`, for
+        example by another process. Only the ``extra_environ`` values which
+        are strings, numbers, booleans or None are saved.
+        """
+        extra_environ = {
+            key: value for key, value in self.extra_environ.items()
+            if value is None or isinstance(value, (str, int, float))}
+        authorization = getattr(self, 'authorization_value', None)
+        if authorization is not None:
+            authorization = [authorization[0], authorization[1]]
+        session = {
+            'version': self.session_version,
+            'cookies': [cookie_to_dict(cookie) for cookie in self.cookiejar],
+            'extra_environ': extra_environ,
+            'authorization': authorization,
+        }
+        with open(path, 'w') as fd:
+            json.dump(session, fd, separators=(',', ':'))
+
+    def load_session(self, path):
+        """
+        Restore the cookies, ``extra_environ`` and authorization saved by
+        :meth:`save_session`. The current cookies and authorization are
+        replaced and ``extra_environ`` is updated with the saved values.
+        """
+        with open(path) as fd:
+            session = json.load(fd)
+        if session.get('version') != self.session_version:
+            raise ValueError('Unsupported session file: %s' % path)
+        self.cookiejar.clear()
+        for data in session['cookies']:
+            self.cookiejar.set_cookie(cookie_from_dict(data))
+        if getattr(self, 'authorization_value', None) is not None:
+            self.authorization = None
+        # may contain a HTTP_AUTHORIZATION given without authorization
+        self.extra_environ.update(session['extra_environ'])
+        authorization = session['authorization']
+        if authorization is not None:
+            authtype, value = authorization
+            if isinstance(value, list):
+                value = tuple(value)
+            self.authorization = (authtype, value)
+
     def set_parser_features(self, parser_features):
         """
         Changes the parser used by BeautifulSoup. See its documentation to
@@ -275,7 +469,9 @@ class TestApp:
         self.RequestClass.ResponseClass.parser_features = parser_features
 
     def get(self, url, params=None, headers=None, extra_environ=None,
-            status=None, expect_errors=False, xhr=False):
+            status=None, expect_errors=False, xhr=False, profile=None,
+            max_memory=None, max_time=None,
+            max_body_size=None, max_queries=None):
         """
         Do a GET request given the url path.
 
@@ -307,10 +503,60 @@ class TestApp:
             headers={'X-REQUESTED-WITH': 'XMLHttpRequest', }
         :type xhr:
             boolean
+        :param profile:
+            If this is true, then the application call, including the
+            consumption of its app_iter, is run under :mod:`cProfile`
+            and the resulting :class:`pstats.Stats` is available as
+            ``res.profile``. Defaults to the ``profile`` setting of the
+            :class:`~webtest.TestApp`.
+        :type profile:
+            boolean
+        :param max_memory:
+            The maximum memory the application may allocate while
+            processing the request, in bytes or as a string like ``'50MB'``.
+            Allocations are traced with :mod:`tracemalloc` and a
+            :class:`~webtest.perf.MemoryReport` is available as
+            ``res.memory``. An :class:`~webtest.AppError` listing the
+            lines which allocated the most memory still held at the end of
+            the request is raised if the budget is exceeded.
+        :type max_memory:
+            number or string
+        :param max_time:
+            The maximum time the application may take to process the
+            request: the application call and the consumption of its
+            app_iter are measured underneath the lint middleware, so
+            the lint checks are not counted. ``profile`` and
+            ``max_memory`` still slow down the application itself. In
+            seconds or as a string like ``'200ms'``.
+        :type max_time:
+            number or string
+        :param max_body_size:
+            The maximum size of the response body returned by the
+            application (before any content decoding), in bytes or as a
+            string like ``'1MB'``.
+        :type max_body_size:
+            number or string
+        :param max_queries:
+            The maximum number of queries the application may do. It is
+            read from the ``paste.testing_variables`` entry named by
+            :attr:`~webtest.TestApp.queries_variable` (``'queries'`` by
+            default), which the application must expose as a number or a
+            list of queries.
+        :type max_queries:
+            integer
+
+        An :class:`~webtest.AppError` describing every exceeded budget is
+        raised if one of ``max_time``, ``max_body_size`` or
+        ``max_queries`` is exceeded.
+
+        When the :class:`~webtest.TestApp` is created with ``timings=True``
+        the time spent in each phase of the request is available as
+        ``res.timings``.
 
         :returns: :class:`webtest.TestResponse` instance.
 
         """
+        timer = self._new_timer()
         environ = self._make_environ(extra_environ)
         url = str(url)
         url = self._remove_fragment(url)
@@ -325,12 +571,21 @@ class TestApp:
             headers = self._add_xhr_header(headers)
         if headers:
             req.headers.update(headers)
+        if timer is not None:
+            req._timer = timer
         return self.do_request(req, status=status,
-                               expect_errors=expect_errors)
+                               expect_errors=expect_errors,
+                               profile=profile,
+                               max_memory=max_memory,
+                               max_time=max_time,
+                               max_body_size=max_body_size,
+                               max_queries=max_queries)
 
     def post(self, url, params='', headers=None, extra_environ=None,
              status=None, upload_files=None, expect_errors=False,
-             content_type=None, xhr=False):
+             content_type=None, xhr=False, profile=None,
+             max_memory=None, max_time=None,
+             max_body_size=None, max_queries=None):
         """
         Do a POST request. Similar to :meth:`~webtest.TestApp.get`.
 
@@ -373,11 +628,18 @@ class TestApp:
                                  extra_environ=extra_environ, status=status,
                                  upload_files=upload_files,
                                  expect_errors=expect_errors,
-                                 content_type=content_type)
+                                 content_type=content_type,
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     def put(self, url, params='', headers=None, extra_environ=None,
             status=None, upload_files=None, expect_errors=False,
-            content_type=None, xhr=False):
+            content_type=None, xhr=False, profile=None,
+            max_memory=None, max_time=None,
+            max_body_size=None, max_queries=None):
         """
         Do a PUT request. Similar to :meth:`~webtest.TestApp.post`.
 
@@ -391,11 +653,17 @@ class TestApp:
                                  upload_files=upload_files,
                                  expect_errors=expect_errors,
                                  content_type=content_type,
-                                 )
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     def patch(self, url, params='', headers=None, extra_environ=None,
               status=None, upload_files=None, expect_errors=False,
-              content_type=None, xhr=False):
+              content_type=None, xhr=False, profile=None,
+              max_memory=None, max_time=None,
+              max_body_size=None, max_queries=None):
         """
         Do a PATCH request. Similar to :meth:`~webtest.TestApp.post`.
 
@@ -408,11 +676,18 @@ class TestApp:
                                  extra_environ=extra_environ, status=status,
                                  upload_files=upload_files,
                                  expect_errors=expect_errors,
-                                 content_type=content_type)
+                                 content_type=content_type,
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     def delete(self, url, params='', headers=None,
                extra_environ=None, status=None, expect_errors=False,
-               content_type=None, xhr=False):
+               content_type=None, xhr=False, profile=None,
+               max_memory=None, max_time=None,
+               max_body_size=None, max_queries=None):
         """
         Do a DELETE request. Similar to :meth:`~webtest.TestApp.get`.
 
@@ -425,10 +700,17 @@ class TestApp:
                                  extra_environ=extra_environ, status=status,
                                  upload_files=None,
                                  expect_errors=expect_errors,
-                                 content_type=content_type)
+                                 content_type=content_type,
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     def options(self, url, headers=None, extra_environ=None,
-                status=None, expect_errors=False, xhr=False):
+                status=None, expect_errors=False, xhr=False, profile=None,
+                max_memory=None, max_time=None,
+                max_body_size=None, max_queries=None):
         """
         Do a OPTIONS request. Similar to :meth:`~webtest.TestApp.get`.
 
@@ -440,10 +722,17 @@ class TestApp:
         return self._gen_request('OPTIONS', url, headers=headers,
                                  extra_environ=extra_environ, status=status,
                                  upload_files=None,
-                                 expect_errors=expect_errors)
+                                 expect_errors=expect_errors,
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     def head(self, url, params=None, headers=None, extra_environ=None,
-             status=None, expect_errors=False, xhr=False):
+             status=None, expect_errors=False, xhr=False, profile=None,
+             max_memory=None, max_time=None,
+             max_body_size=None, max_queries=None):
         """
         Do a HEAD request. Similar to :meth:`~webtest.TestApp.get`.
 
@@ -457,7 +746,12 @@ class TestApp:
         return self._gen_request('HEAD', url, headers=headers,
                                  extra_environ=extra_environ, status=status,
                                  upload_files=None,
-                                 expect_errors=expect_errors)
+                                 expect_errors=expect_errors,
+                                 profile=profile,
+                                 max_memory=max_memory,
+                                 max_time=max_time,
+                                 max_body_size=max_body_size,
+                                 max_queries=max_queries)
 
     post_json = utils.json_method('POST')
     put_json = utils.json_method('PUT')
@@ -545,7 +839,8 @@ class TestApp:
         return content_type, body
 
     def request(self, url_or_req, status=None, expect_errors=False,
-                **req_params):
+                profile=None, max_memory=None, max_time=None,
+                max_body_size=None, max_queries=None, **req_params):
         """
         Creates and executes a request. You may either pass in an
         instantiated :class:`TestRequest` object, or you may pass in a
@@ -586,9 +881,15 @@ class TestApp:
         return self.do_request(req,
                                status=status,
                                expect_errors=expect_errors,
-                               )
-
-    def do_request(self, req, status=None, expect_errors=None):
+                               profile=profile,
+                               max_memory=max_memory,
+                               max_time=max_time,
+                               max_body_size=max_body_size,
+                               max_queries=max_queries)
+
+    def do_request(self, req, status=None, expect_errors=None,
+                   profile=None, max_memory=None, max_time=None,
+                   max_body_size=None, max_queries=None):
         """
         Executes the given webob Request (``req``), with the expected
         ``status``.  Generally :meth:`~webtest.TestApp.get` and
@@ -607,57 +908,194 @@ class TestApp:
 
         """
 
-        errors = StringIO()
-        req.environ['wsgi.errors'] = errors
-        script_name = req.environ.get('SCRIPT_NAME', '')
-        if script_name and req.path_info.startswith(script_name):
-            req.path_info = req.path_info[len(script_name):]
-
-        # set framework hooks
-        req.environ['paste.testing'] = True
-        req.environ['paste.testing_variables'] = {}
-
-        # set request cookies
-        self.cookiejar.add_cookie_header(utils._RequestCookieAdapter(req))
-
-        # verify wsgi compatibility
-        app = lint.middleware(self.app) if self.lint else self.app
-
-        # FIXME: should it be an option to not catch exc_info?
-        res = req.get_response(app, catch_exc_info=True)
-
-        # be sure to decode the content
-        res.decode_content()
-
-        # set a few handy attributes
-        res._use_unicode = self.use_unicode
-        res.request = req
-        res.app = app
-        res.test_app = self
-
-        # We do this to make sure the app_iter is exhausted:
+        hooks = self._hooks
+        if hooks:
+            for hook in hooks.get('before_request', ()):
+                hook(req)
+        trace = None
+        if self.trace is not None:
+            trace = tracing.RequestTrace(req.environ)
+            req.environ['HTTP_TRACEPARENT'] = trace.traceparent
         try:
-            res.body
-        except TypeError:  # pragma: no cover
-            pass
-        res.errors = errors.getvalue()
-
-        for name, value in req.environ['paste.testing_variables'].items():
-            if hasattr(res, name):
-                raise ValueError(
-                    "paste.testing_variables contains the variable %r, but "
-                    "the response object already has an attribute by that "
-                    "name" % name)
-            setattr(res, name, value)
-        if not expect_errors:
-            self._check_status(status, res)
-            self._check_errors(res)
-
-        # merge cookies back in
-        self.cookiejar.extract_cookies(utils._ResponseCookieAdapter(res),
-                                       utils._RequestCookieAdapter(req))
-
-        return res
+            timer = None
+            if self.timings is not None or trace is not None:
+                timer = getattr(req, '_timer', None) or self._new_timer()
+
+            errors = StringIO()
+            req.environ['wsgi.errors'] = errors
+            script_name = req.environ.get('SCRIPT_NAME', '')
+            if script_name and req.path_info.startswith(script_name):
+                req.path_info = req.path_info[len(script_name):]
+
+            # set framework hooks
+            req.environ['paste.testing'] = True
+            req.environ['paste.testing_variables'] = {}
+            if timer is not None:
+                timer.lap('environ')
+
+            # set request cookies
+            self.cookiejar.add_cookie_header(utils._RequestCookieAdapter(req))
+            if timer is not None:
+                timer.lap('cookie_header')
+
+            # verify wsgi compatibility
+            app = self.app
+            lint_policy = self._lint
+            lint_report = None
+            linted = lint_policy is True or (
+                lint_policy and lint_policy.should_lint(req))
+            # the application alone is timed when the time spent in the
+            # lint middleware is measured, or for the max_time budget
+            app_timing = None
+            if max_time is not None or (timer is not None and linted):
+                app_timing = perf.AppTiming()
+                req.environ['webtest.app_timing'] = app_timing
+            if linted or app_timing is not None:
+                # built once and reused as long as self.app is unchanged
+                timed_app = self._timed_app
+                if timed_app is None or timed_app.application is not app:
+                    timed_app = self._timed_app = perf.AppTimer(app)
+                    self._lint_app = None
+                app = timed_app
+            if linted:
+                lint_app = self._lint_app
+                if lint_app is None:
+                    lint_app = self._lint_app = lint.middleware(
+                        app, performance=(lint_policy is not True and
+                                          lint_policy.performance))
+                app = lint_app
+                if lint_policy is not True and lint_policy.collect:
+                    lint_report = lint.LintReport()
+                    req.environ['webtest.lint_report'] = lint_report
+
+            memory = None
+            if max_memory is not None:
+                max_memory = perf.parse_size(max_memory)
+                memory = perf.MemoryTracker()
+                memory.start()
+
+            if profile is None:
+                profile = self.profile
+            profiler = None
+            if profile and perf.match_path(profile, req.path_info):
+                profiler = cProfile.Profile()
+                profiler.enable()
+
+            app_time = body_size = None
+            if max_time is not None:
+                max_time = perf.parse_duration(max_time)
+            if timer is not None:
+                timer.mark()
+            started = perf_counter()
+            try:
+                # FIXME: should it be an option to not catch exc_info?
+                res = req.get_response(app, catch_exc_info=True)
+                called = perf_counter()
+
+                # We do this to make sure the app_iter is exhausted:
+                try:
+                    res.body
+                except TypeError:  # pragma: no cover
+                    pass
+                ended = perf_counter()
+            except Exception as exc:
+                # the app phase ends with the exception
+                if timer is not None:
+                    if linted and app_timing.call_start:
+                        timer.add('lint', started, app_timing.call_start)
+                        started = app_timing.call_start
+                    timer.add('app', started)
+                if trace is not None:
+                    trace.app_exc = exc
+                raise
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if memory is not None:
+                    memory = memory.stop()
+            if app_timing is not None:
+                app_time = app_timing.call + app_timing.iteration
+            if timer is not None:
+                if linted:
+                    self._add_lint_phases(timer, app_timing, started,
+                                          called, ended)
+                else:
+                    timer.add('app', started, called)
+                    timer.add('app_iter', called, ended)
+
+            if lint_report is not None:
+                # the deferred checks
+                if timer is not None:
+                    timer.mark()
+                lint_report.finish()
+                lint_policy.summary.add(req, lint_report)
+                res.lint_report = lint_report
+                if timer is not None:
+                    timer.lap('lint', calls=0)
+
+            if max_body_size is not None:
+                max_body_size = perf.parse_size(max_body_size)
+                body_size = len(res.body)
+
+            # be sure to decode the content
+            if timer is not None:
+                timer.mark()
+            res.decode_content()
+            if timer is not None:
+                timer.lap('decode_content')
+                res.timings = timer
+
+            # set a few handy attributes
+            res._use_unicode = self.use_unicode
+            res.request = req
+            res.app = app
+            res.test_app = self
+            res.errors = errors.getvalue()
+
+            testing_variables = req.environ['paste.testing_variables']
+            for name, value in testing_variables.items():
+                if hasattr(res, name):
+                    raise ValueError(
+                        "paste.testing_variables contains the variable %r, "
+                        "but the response object already has an attribute "
+                        "by that name" % name)
+                setattr(res, name, value)
+            if profiler is not None:
+                res.profile = perf.profile_stats(profiler, req,
+                                                 self.profile_dir)
+            if memory is not None:
+                res.memory = memory
+            if hooks:
+                for hook in hooks.get('after_response', ()):
+                    hook(req, res)
+            if not expect_errors:
+                self._check_status(status, res)
+                self._check_errors(res)
+            if max_memory is not None:
+                self._check_memory(max_memory, res)
+            if max_time is not None or max_body_size is not None or \
+                    max_queries is not None:
+                self._check_budgets(req, max_time, app_time,
+                                    max_body_size, body_size, max_queries)
+
+            # merge cookies back in
+            if timer is not None:
+                timer.mark()
+            self.cookiejar.extract_cookies(utils._ResponseCookieAdapter(res),
+                                           utils._RequestCookieAdapter(req))
+            if timer is not None:
+                timer.lap('cookie_extract')
+            if trace is not None:
+                self.trace.export(trace.spans(req, timer, res))
+
+            return res
+        except Exception as exc:
+            if trace is not None:
+                self.trace.export(trace.spans(req, timer, exc=exc))
+            if hooks:
+                for hook in hooks.get('on_error', ()):
+                    hook(req, exc)
+            raise
 
     def _check_status(self, status, res):
         if status == '*':
@@ -693,6 +1131,62 @@ class TestApp:
             raise AppError(
                 "Application had errors logged:\n%s", errors)
 
+    def _check_memory(self, max_memory, res):
+        if res.memory.peak > max_memory:
+            raise AppError(
+                "Memory budget exceeded: %s (more than %s for %s)\n%s",
+                perf.format_size(res.memory.peak),
+                perf.format_size(max_memory), res.request.url, res.memory)
+
+    def _check_budgets(self, req, max_time, app_time, max_body_size,
+                       body_size, max_queries):
+        exceeded = []
+        if max_time is not None and app_time > max_time:
+            exceeded.append('time: %.3fs (max %.3fs)' % (app_time, max_time))
+        if max_body_size is not None and body_size > max_body_size:
+            exceeded.append('body size: %s (max %s)' % (
+                perf.format_size(body_size), perf.format_size(max_body_size)))
+        if max_queries is not None:
+            queries = self._get_queries(req)
+            if queries > max_queries:
+                exceeded.append('queries: %d (max %d)' % (
+                    queries, max_queries))
+        if exceeded:
+            raise AppError(
+                "Performance budget exceeded for %s:\n%s",
+                req.url, '\n'.join('  ' + e for e in exceeded))
+
+    def _get_queries(self, req):
+        testing_variables = req.environ['paste.testing_variables']
+        if self.queries_variable not in testing_variables:
+            raise AppError(
+                "max_queries requires the application to expose the number "
+                "of queries as paste.testing_variables[%r]",
+                self.queries_variable)
+        queries = testing_variables[self.queries_variable]
+        if not isinstance(queries, int):
+            queries = len(queries)
+        return queries
+
+    @staticmethod
+    def _add_lint_phases(timer, app_timing, started, called, ended):
+        # the lint middleware runs before, around and after the
+        # application: the time not spent in the application is recorded
+        # as lint, in several parts counted as a single call
+        call_start = app_timing.call_start or called
+        call_end = call_start + app_timing.call
+        iter_end = called + app_timing.iteration
+        timer.add('lint', started, call_start)
+        timer.add('app', call_start, call_end)
+        timer.add('lint', call_end, called, calls=0)
+        timer.add('app_iter', called, iter_end)
+        timer.add('lint', iter_end, ended, calls=0)
+
+    def _new_timer(self):
+        if self.timings is not None or self.trace is not None:
+            return perf.RequestTimer(self.timings)
+        return None
+
     def _make_environ(self, extra_environ=None):
         environ = self.extra_environ.copy()
         environ['paste.throw_errors'] = True
@@ -707,11 +1201,14 @@ class TestApp:
     def _gen_request(self, method, url, params=utils.NoDefault,
                      headers=None, extra_environ=None, status=None,
                      upload_files=None, expect_errors=False,
-                     content_type=None):
+                     content_type=None, profile=None,
+                     max_memory=None, max_time=None,
+                     max_body_size=None, max_queries=None):
         """
         Do a generic request.
         """
 
+        timer = self._new_timer()
         environ = self._make_environ(extra_environ)
 
         inline_uploads = []
@@ -753,8 +1250,15 @@ class TestApp:
         req.content_length = len(params)
         if headers:
             req.headers.update(headers)
+        if timer is not None:
+            req._timer = timer
         return self.do_request(req, status=status,
-                               expect_errors=expect_errors)
+                               expect_errors=expect_errors,
+                               profile=profile,
+                               max_memory=max_memory,
+                               max_time=max_time,
+                               max_body_size=max_body_size,
+                               max_queries=max_queries)
 
     def _get_file_info(self, file_info):
         if len(file_info) == 2:
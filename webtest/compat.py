@@ -1,3 +1,4 @@
+import re
 import sys
 from http import cookies
 
@@ -26,9 +27,26 @@ def escape_cookie_value(value):
     Escapes a value so that it can be safely stored in a cookie.
 
     """
-    return '"' + ''.join(
-        COOKIE_ESCAPE_CHAR_MAP.get(x, x) for x in value
-    ) + '"'
+    return '"' + value.translate(COOKIE_ESCAPE_TABLE) + '"'
+
+
+def _unescape_char(match):
+    octal, char = match.groups()
+    if octal is not None:
+        return chr(int(octal, 8))
+    return char
+
+
+def unescape_cookie_value(value):
+    """
+    Reverts :func:`escape_cookie_value`.
+
+    """
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    if '\\' not in value:
+        return value
+    return COOKIE_ESCAPED_CHAR_RE.sub(_unescape_char, value)
 
 
 # A list of illegal characters in a cookie and the escaped equivalent.
@@ -97,3 +115,6 @@ COOKIE_ESCAPE_CHAR_MAP = {
     '\372' : '\\372',  '\373' : '\\373',  '\374' : '\\374',
     '\375' : '\\375',  '\376' : '\\376',  '\377' : '\\377'
     }
+
+COOKIE_ESCAPE_TABLE = str.maketrans(COOKIE_ESCAPE_CHAR_MAP)
+COOKIE_ESCAPED_CHAR_RE = re.compile(r'\\(?:([0-3][0-7]{2})|(.))', re.S)
@@ -0,0 +1,224 @@
+"""
+The cookie jar used by default by :class:`~webtest.app.TestApp`.
+
+:class:`CookieJar` is a :class:`http.cookiejar.CookieJar` which keeps the
+same storage, indexed by domain, path and name, but avoids re-evaluating
+the whole cookie policy for each stored cookie on each request when the
+policy is the default :class:`CookiePolicy`.
+"""
+
+import copy
+import threading
+import time
+
+from http import cookiejar as http_cookiejar
+
+
+__all__ = ['CookieJar', 'CookiePolicy', 'copy_cookiejar', 'cookie_to_dict',
+           'cookie_from_dict']
+
+
+class CookiePolicy(http_cookiejar.DefaultCookiePolicy):
+    """A subclass of DefaultCookiePolicy to allow cookie set for
+    Domain=localhost."""
+
+    def return_ok_domain(self, cookie, request):
+        if cookie.domain == '.localhost':
+            return True
+        return http_cookiejar.DefaultCookiePolicy.return_ok_domain(
+            self, cookie, request)
+
+    def set_ok_domain(self, cookie, request):
+        if cookie.domain == '.localhost':
+            return True
+        return http_cookiejar.DefaultCookiePolicy.set_ok_domain(
+            self, cookie, request)
+
+
+# the arguments of http.cookiejar.Cookie
+COOKIE_FIELDS = (
+    'version', 'name', 'value', 'port', 'port_specified', 'domain',
+    'domain_specified', 'domain_initial_dot', 'path', 'path_specified',
+    'secure', 'expires', 'discard', 'comment', 'comment_url', 'rfc2109',
+)
+
+
+def cookie_to_dict(cookie):
+    """Return the attributes of ``cookie`` as a dict which can be encoded as
+    JSON"""
+    data = {field: getattr(cookie, field) for field in COOKIE_FIELDS}
+    data['rest'] = dict(cookie._rest)
+    return data
+
+
+def cookie_from_dict(data):
+    """Build a :class:`http.cookiejar.Cookie` from the result of
+    :func:`cookie_to_dict`"""
+    return http_cookiejar.Cookie(**data)
+
+
+def _dotted(domain):
+    if domain and not domain.startswith('.'):
+        return '.' + domain
+    return domain
+
+
+class CookieJar(http_cookiejar.CookieJar):
+    """A :class:`http.cookiejar.CookieJar` using a :class:`CookiePolicy`
+    by default.
+
+    When the policy is a :class:`CookiePolicy` with its default options,
+    the cookies returned to the server are selected in a single pass: the
+    request host, path and port are computed once per request instead of
+    once per cookie and the domains which can't match are skipped. The
+    expiry of the cookies is tracked when they are set so expired cookies
+    are only looked for when one may have expired. Other policies use the
+    :class:`http.cookiejar.CookieJar` implementation. The options of the
+    policy are only checked the first time the jar uses it, so give the
+    jar a new policy rather than changing the options of the current one.
+
+    :meth:`copy` returns a copy-on-write clone of the jar.
+    """
+
+    def __init__(self, policy=None):
+        if policy is None:
+            policy = CookiePolicy()
+        super().__init__(policy)
+        # the earliest expiry of the stored cookies
+        self._next_expiry = None
+        # True when self._cookies is shared with a copy
+        self._shared = False
+        # the policy last checked by _fast_policy() and the result
+        self._fast_policy_cache = (None, False)
+
+    def copy(self):
+        """Return a copy of the jar, using the same policy. The cookies are
+        only copied when one of the jars is changed."""
+        with self._cookies_lock:
+            jar = copy.copy(self)
+            jar._cookies_lock = threading.RLock()
+            self._shared = jar._shared = True
+        return jar
+
+    def _unshare(self):
+        # copy the cookies before changing them
+        if self._shared:
+            self._cookies = _copy_cookies(self._cookies)
+            self._shared = False
+
+    def _fast_policy(self):
+        # True if the checks done by _cookies_for_request() are the same
+        # as the ones of the policy. The result is kept for the policy
+        # object, so the options of a policy should not be changed once it
+        # is used.
+        policy = self._policy
+        cached, fast = self._fast_policy_cache
+        if cached is not policy:
+            fast = (type(policy) is CookiePolicy and
+                    policy.netscape and not policy.rfc2965 and
+                    not policy.strict_ns_unverifiable and
+                    policy.strict_ns_domain == policy.DomainLiberal and
+                    not policy.blocked_domains() and
+                    policy.allowed_domains() is None)
+            self._fast_policy_cache = (policy, fast)
+        return fast
+
+    def _cookies_for_request(self, request):
+        if not self._cookies:
+            return []
+        if not self._fast_policy():
+            return super()._cookies_for_request(request)
+
+        req_host, erhn = http_cookiejar.eff_request_host(request)
+        dotted_host = _dotted(req_host)
+        dotted_erhn = _dotted(erhn)
+        # computed once a domain matches
+        req_path = secure = req_port = None
+        now = self._now
+
+        cookies = []
+        for domain, cookies_by_path in self._cookies.items():
+            dotdomain = _dotted(domain)
+            if not (dotted_host.endswith(dotdomain) or
+                    dotted_erhn.endswith(dotdomain)):
+                continue
+            # CookiePolicy.return_ok_domain()
+            if domain != '.localhost' and \
+                    not ('.' + erhn).endswith(dotdomain):
+                continue
+            if req_path is None:
+                req_path = http_cookiejar.request_path(request)
+                secure = request.type in getattr(
+                    self._policy, 'secure_protocols', ('https',))
+            for path, cookies_by_name in cookies_by_path.items():
+                if req_path != path:
+                    if not req_path.startswith(path):
+                        continue
+                    if not (path.endswith('/') or
+                            req_path[len(path):len(path) + 1] == '/'):
+                        continue
+                for cookie in cookies_by_name.values():
+                    if cookie.version != 0:
+                        continue
+                    if cookie.secure and not secure:
+                        continue
+                    if cookie.is_expired(now):
+                        continue
+                    if cookie.port:
+                        if req_port is None:
+                            req_port = (http_cookiejar.request_port(request)
+                                        or '80')
+                        if req_port not in cookie.port.split(','):
+                            continue
+                    cookies.append(cookie)
+        return cookies
+
+    def set_cookie(self, cookie):
+        with self._cookies_lock:
+            self._unshare()
+            super().set_cookie(cookie)
+        expires = cookie.expires
+        if expires is not None and (self._next_expiry is None or
+                                    expires < self._next_expiry):
+            self._next_expiry = expires
+
+    def clear(self, domain=None, path=None, name=None):
+        with self._cookies_lock:
+            self._unshare()
+            super().clear(domain, path, name)
+
+    def clear_expired_cookies(self):
+        next_expiry = self._next_expiry
+        if next_expiry is None or time.time() < next_expiry:
+            return
+        super().clear_expired_cookies()
+        self._next_expiry = min(
+            (cookie.expires for cookie in self if cookie.expires is not None),
+            default=None)
+
+    def extract_cookies(self, response, request):
+        headers = response.info()
+        if not headers.get_all('Set-Cookie', []) and \
+                not headers.get_all('Set-Cookie2', []):
+            return
+        super().extract_cookies(response, request)
+
+
+def _copy_cookies(cookies):
+    return {domain: {path: {name: copy.copy(cookie)
+                            for name, cookie in by_name.items()}
+                     for path, by_name in by_path.items()}
+            for domain, by_path in cookies.items()}
+
+
+def copy_cookiejar(jar):
+    """Return a copy of ``jar``. Its ``copy()`` method is used if it has
+    one, else the cookies of the :class:`http.cookiejar.CookieJar` are
+    copied."""
+    if hasattr(jar, 'copy'):
+        return jar.copy()
+    with jar._cookies_lock:
+        clone = copy.copy(jar)
+        clone._cookies_lock = threading.RLock()
+        clone._cookies = _copy_cookies(jar._cookies)
+    return clone
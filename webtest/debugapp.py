@@ -1,15 +1,85 @@
+import functools
 import os
+import time
+
+from urllib.parse import parse_qsl
 
 import webob
 
+from webtest.perf import parse_duration
+from webtest.perf import parse_size
+
 
 __all__ = ['DebugApp', 'make_debug_app']
 
 
+#: the parameters of the benchmark mode and how their values are parsed
+BENCH_PARAMS = {
+    'size': parse_size,
+    'chunks': int,
+    'latency': parse_duration,
+    'cookies': int,
+    'forms': int,
+    'links': int,
+}
+
+
+@functools.lru_cache(maxsize=8)
+def bench_body(size=0, chunks=1, forms=0, links=0):
+    """Return the body of a benchmark response, split in ``chunks``
+    chunks. It is a HTML page with ``forms`` forms and ``links`` links,
+    padded with a comment up to ``size`` bytes, or ``size`` bytes of
+    text."""
+    if forms or links:
+        parts = [b'<html><body>\n']
+        for i in range(links):
+            parts.append(b'<a href="/link/%d" id="link-%d">link %d</a>\n' % (
+                i, i, i))
+        for i in range(forms):
+            parts.append(
+                b'<form action="/form/%d" method="POST" id="form-%d">\n'
+                b'<input type="text" name="field" value="%d">\n'
+                b'<input type="submit" name="submit" value="Submit">\n'
+                b'</form>\n' % (i, i, i))
+        end = b'</body></html>\n'
+        padding = size - sum(map(len, parts)) - len(end)
+        if padding >= 7:
+            parts.append(b'<!--' + b'x' * (padding - 7) + b'-->')
+        parts.append(end)
+        body = b''.join(parts)
+    else:
+        body = b'x' * size
+    chunks = max(chunks, 1)
+    length, extra = divmod(len(body), chunks)
+    result = []
+    start = 0
+    for i in range(chunks):
+        end = start + length + (i < extra)
+        result.append(body[start:end])
+        start = end
+    return tuple(result)
+
+
 class DebugApp:
-    """The WSGI application used for testing"""
+    """The WSGI application used for testing.
+
+    The benchmark mode gives a cheap and reproducible application to
+    measure the overhead of webtest itself. It is enabled by one of the
+    following options, given as query string parameters or as arguments
+    (like ``make_debug_app`` config), the query string taking precedence
+    and its invalid values being ignored:
+
+    - ``size``: the size of the body, like ``10KB``. The bodies are cached.
+    - ``chunks``: the number of chunks of the body
+    - ``latency``: a delay before the response, like ``20ms``
+    - ``cookies``: the number of ``Set-Cookie`` headers
+    - ``forms`` and ``links``: the number of forms and links of a
+      generated HTML page, padded up to ``size``
+
+    In benchmark mode the environ is not dumped in the response.
+    """
 
-    def __init__(self, form=None, show_form=False):
+    def __init__(self, form=None, show_form=False, **bench):
         if form and os.path.isfile(form):
             fd = open(form, 'rb')
             self.form = fd.read()
@@ -17,8 +87,38 @@ class DebugApp:
         else:
             self.form = form
         self.show_form = show_form
+        for name in bench:
+            if name not in BENCH_PARAMS:
+                raise TypeError('Unknown DebugApp option: %r' % name)
+        self.bench = self.bench_params(bench)
+
+    @staticmethod
+    def bench_params(values, strict=True):
+        """Return the benchmark options found in the ``values`` mapping,
+        parsed. The values which can't be parsed raise a :class:`ValueError`,
+        or are ignored if ``strict`` is false."""
+        params = {}
+        for name, value in values.items():
+            if name not in BENCH_PARAMS or value in (None, ''):
+                continue
+            try:
+                params[name] = BENCH_PARAMS[name](value)
+            except ValueError:
+                if strict:
+                    raise
+        return params
 
     def __call__(self, environ, start_response):
+        if self.bench or environ.get('QUERY_STRING'):
+            params = self.bench
+            query = environ.get('QUERY_STRING')
+            if query:
+                params = dict(params,
+                              **self.bench_params(dict(parse_qsl(query)),
+                                                  strict=False))
+            if params:
+                return self.bench_response(environ, start_response, params)
+
         req = webob.Request(environ)
         if req.path_info == '/form.html' and req.method == 'GET':
             resp = webob.Response(content_type='text/html')
@@ -79,6 +179,25 @@ class DebugApp:
                 resp.body = body
         return resp(environ, start_response)
 
+    def bench_response(self, environ, start_response, params):
+        latency = params.get('latency')
+        if latency:
+            time.sleep(latency)
+        forms = params.get('forms', 0)
+        links = params.get('links', 0)
+        body = bench_body(params.get('size', 0), params.get('chunks', 1),
+                          forms, links)
+        headers = [
+            ('Content-Type',
+             'text/html; charset=utf-8' if forms or links else 'text/plain'),
+            ('Content-Length', str(sum(map(len, body))))]
+        for i in range(params.get('cookies', 0)):
+            headers.append(('Set-Cookie', 'bench%d=%d; Path=/' % (i, i)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return body
+
 
 debug_app = DebugApp(form=b'''<html><body>
 <form action="/form-submit" method="POST">
@@ -90,5 +209,8 @@ debug_app = DebugApp(form=b'''<html><body>
 def make_debug_app(global_conf, **local_conf):
     """An application that displays the request environment, and does
     nothing else (useful for debugging and test purposes).
+
+    The benchmark options of :class:`DebugApp` can be given in the
+    config.
     """
     return DebugApp(**local_conf)
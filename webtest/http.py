@@ -3,17 +3,29 @@ This module contains some helpers to deal with the real http
 world.
 """
 
+import errno
+import json
 import threading
 import logging
 import select
+import signal
 import socket
+import stat
 import time
+import zlib
 import os
+import weakref
 
+from collections import deque
 from http import client
+from time import perf_counter
+from urllib.parse import quote
+from urllib.parse import unquote
 
 import webob
+from waitress import server as waitress_server
 from waitress.server import TcpWSGIServer
+from waitress.task import ThreadedTaskDispatcher
 
 
 def get_free_port():
@@ -21,40 +33,437 @@ def get_free_port():
     s.bind(('', 0))
     ip, port = s.getsockname()
     s.close()
-    ip = os.environ.get('WEBTEST_SERVER_BIND', '127.0.0.1')
+    ip = get_bind_host()
     return ip, port
 
 
+def get_bind_host():
+    """Return the host the servers listen on: ``$WEBTEST_SERVER_BIND`` or
+    ``127.0.0.1``"""
+    return os.environ.get('WEBTEST_SERVER_BIND', '127.0.0.1')
+
+
+class PortRange:
+    """Ports from ``start`` to ``stop`` (excluded) split between the
+    processes of a test run, so servers started at the same time by
+    several processes never try the same port::
+
+        StopableWSGIServer.create(app, port_range=PortRange(20000, 21000))
+
+    Each `pytest-xdist <https://pypi.org/project/pytest-xdist/>`_ worker
+    gets its own slice of the range, found from ``worker`` and
+    ``workers`` which default to the ``PYTEST_XDIST_WORKER`` (like
+    ``gw3``) and ``PYTEST_XDIST_WORKER_COUNT`` environment variables.
+    Ports are tried in turn from the last one used, so a port just
+    released is not reused at once.
+
+    :meth:`from_environ` builds the range used by default by
+    :meth:`StopableWSGIServer.create`.
+    """
+
+    #: the ranges built by :meth:`from_environ`, so the rotation of the
+    #: ports holds from one server to the next
+    _environ_ranges = {}
+
+    def __init__(self, start, stop, worker=None, workers=None):
+        if worker is None:
+            worker = os.environ.get('PYTEST_XDIST_WORKER', '0')
+        if workers is None:
+            workers = os.environ.get('PYTEST_XDIST_WORKER_COUNT', '1')
+        if isinstance(worker, str):
+            worker = worker.lstrip('gw') or '0'
+        worker, workers = int(worker), int(workers)
+        size = (stop - start) // workers
+        if worker >= workers or size < 1:
+            raise ValueError(
+                'Unable to give a port of %d-%d to worker %d of %d' % (
+                    start, stop, worker, workers))
+        self.ports = range(start + worker * size, start + (worker + 1) * size)
+        self.lock = threading.Lock()
+        self.next = 0
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Return the range given by ``$WEBTEST_PORT_RANGE``, like
+        ``20000-21000``, or None if it is not set. The same value always
+        gives the same range."""
+        if environ is None:
+            environ = os.environ
+        value = environ.get('WEBTEST_PORT_RANGE')
+        if not value:
+            return None
+        key = (cls, value, os.environ.get('PYTEST_XDIST_WORKER'),
+               os.environ.get('PYTEST_XDIST_WORKER_COUNT'))
+        ports = cls._environ_ranges.get(key)
+        if ports is None:
+            start, sep, stop = value.partition('-')
+            if not sep:
+                raise ValueError('Invalid WEBTEST_PORT_RANGE: %r' % value)
+            ports = cls._environ_ranges.setdefault(
+                key, cls(int(start), int(stop)))
+        return ports
+
+    def __iter__(self):
+        """Iterate once over the ports of the slice"""
+        with self.lock:
+            first = self.next
+            self.next = (first + 1) % len(self.ports)
+        for i in range(len(self.ports)):
+            yield self.ports[(first + i) % len(self.ports)]
+
+    def bind(self, host):
+        """Return a socket bound to ``host`` and the first free port of the
+        slice. Raise :class:`OSError` if no port is free."""
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        for port in self:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            if os.name == 'nt':  # pragma: no cover
+                # SO_REUSEADDR allows to bind a port in use on Windows
+                sock.setsockopt(socket.SOL_SOCKET,
+                                socket.SO_EXCLUSIVEADDRUSE, 1)
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind((host, port))
+            except OSError as e:
+                sock.close()
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                continue
+            with self.lock:
+                self.next = (self.ports.index(port) + 1) % len(self.ports)
+            return sock
+        raise OSError(errno.EADDRINUSE,
+                      'No free port in %d-%d' % (self.ports.start,
+                                                 self.ports.stop))
+
+    def __repr__(self):
+        return '<PortRange %d-%d>' % (self.ports.start, self.ports.stop)
+
+
 def check_server(host, port, path_info='/', timeout=3, retries=30):
     """Perform a request until the server reply"""
     if retries < 0:
         return 0
-    time.sleep(.3)
     for i in range(retries):
+        if i:
+            time.sleep(.3)
         try:
             conn = client.HTTPConnection(host, int(port), timeout=timeout)
             conn.request('GET', path_info)
             res = conn.getresponse()
             return res.status
         except (OSError, client.HTTPException):
-            time.sleep(.3)
+            pass
     return 0
 
 
+def file_iter(fd, block_size):
+    """Iterate over the file ``fd`` by chunks of ``block_size`` bytes. Used
+    when the WSGI server provides no ``wsgi.file_wrapper``"""
+    try:
+        while True:
+            chunk = fd.read(block_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fd.close()
+
+
+def unix_socket_url(path):
+    """Return the ``http+unix://`` url of a server listening on the unix
+    socket ``path``"""
+    return 'http+unix://%s/' % quote(path, safe='')
+
+
+def parse_unix_socket_url(url):
+    """Split a ``http+unix://`` url into the path of the socket and the url
+    of the server, like ``('/tmp/app.sock', 'http://localhost/prefix')``"""
+    if not url.startswith('http+unix://'):
+        raise ValueError('Not a http+unix:// url: %r' % url)
+    socket_path, _, path = url[len('http+unix://'):].partition('/')
+    return unquote(socket_path), 'http://localhost/' + path
+
+
+class UnixHTTPConnection(client.HTTPConnection):
+    """A :class:`http.client.HTTPConnection` to a server listening on the
+    unix socket ``path``"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_socket = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.unix_socket)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class HttpClient:
+    """A client for WSGIProxy2's :class:`wsgiproxy.HostProxy` which can
+    send the requests to a unix socket and keep connections alive::
+
+        proxy = HostProxy('http://localhost',
+                          client=HttpClient(unix_socket='/tmp/app.sock'))
+
+    If ``pool_size`` is given, up to ``pool_size`` idle connections per host
+    are kept open and reused by the next requests. More connections are
+    opened when more requests are done concurrently, but they are closed
+    once done. A request sent on a reused connection which was closed by
+    the server is sent again on a new connection.
+
+    :class:`~webtest.app.TestApp` uses it for ``http+unix://`` urls and for
+    urls ending with ``#pool`` or ``#pool:{size}``.
+    """
+
+    default_pool_size = 10
+
+    def __init__(self, unix_socket=None, pool_size=None, timeout=None):
+        self.unix_socket = unix_socket
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    @classmethod
+    def from_url(cls, url, client='httplib'):
+        """Return the url of the server and the client to use for an url
+        like ``http+unix://%2Ftmp%2Fapp.sock/`` and a client name like
+        ``'httplib'``, ``'pool'`` or ``'pool:4'``"""
+        unix_socket = None
+        if url.startswith('http+unix://'):
+            unix_socket, url = parse_unix_socket_url(url)
+        name, _, size = client.partition(':')
+        if name == 'pool':
+            pool_size = int(size) if size else cls.default_pool_size
+        elif name == 'httplib' and not size:
+            pool_size = None
+        else:
+            raise ValueError('Unsupported client for %s: %r' % (url, client))
+        return url, cls(unix_socket=unix_socket, pool_size=pool_size)
+
+    def connection(self, scheme, host):
+        """Return a new connection to ``host``"""
+        if self.unix_socket is not None:
+            return UnixHTTPConnection(self.unix_socket, timeout=self.timeout)
+        if scheme == 'https':
+            return client.HTTPSConnection(host, timeout=self.timeout)
+        return client.HTTPConnection(host, timeout=self.timeout)
+
+    def _acquire(self, key):
+        if self.pool_size:
+            with self.lock:
+                idle = self.pools.get(key)
+                if idle:
+                    return idle.pop(), True
+        return self.connection(*key), False
+
+    def _release(self, key, conn, response):
+        if self.pool_size and not response.will_close:
+            with self.lock:
+                idle = self.pools.setdefault(key, [])
+                if len(idle) < self.pool_size:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def _send(self, key, method, path, body, headers):
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError):
+                conn.close()
+                if reused:
+                    # closed by the server while it was idle
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._release(key, conn, response)
+            return response, data
+
+    def __call__(self, uri, method, body, headers):
+        scheme, _, rest = uri.partition('://')
+        host, _, path = rest.partition('/')
+        if 'Transfer-Encoding' in headers:
+            del headers['Transfer-Encoding']
+        if headers.get('Content-Length'):
+            body = body.read(int(headers['Content-Length']))
+        else:
+            body = None
+        response, body = self._send((scheme, host), method, '/' + path,
+                                    body, headers)
+        resp_headers = [(k, v) for k, v in response.getheaders()
+                        if k.lower() != 'transfer-encoding']
+        return ('%s %s' % (response.status, response.reason),
+                response.getheader('location', None), resp_headers, [body])
+
+    def close(self):
+        """Close the idle connections"""
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+def percentiles(samples):
+    """Return the 50th, 90th and 99th percentiles and the maximum of
+    ``samples``, in milliseconds"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    last = len(samples) - 1
+    result = {'p%d' % p: round(samples[last * p // 100] * 1000, 3)
+              for p in (50, 90, 99)}
+    result['max'] = round(samples[last] * 1000, 3)
+    return result
+
+
+class ServerMetrics:
+    """Requests served by a :class:`StopableWSGIServer`. The latency of a
+    request lasts until the server closes its response, so the time spent
+    sending the body is included, except for the responses which are a
+    list, a tuple or a ``wsgi.file_wrapper``: they are given as is to the
+    server and their latency ends when the application returns them. Only
+    the last ``max_samples`` latencies of each path are kept."""
+
+    max_samples = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the requests served. Requests in flight are still
+        counted"""
+        with self.lock:
+            self.requests = 0
+            self.latencies = deque(maxlen=self.max_samples)
+            self.paths = {}
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+        return perf_counter()
+
+    def finish(self, path, start):
+        latency = perf_counter() - start
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.latencies.append(latency)
+            samples = self.paths.get(path)
+            if samples is None:
+                samples = self.paths[path] = deque(maxlen=self.max_samples)
+            samples.append(latency)
+
+    def as_dict(self, dispatcher=None):
+        """Return the metrics as a dict which can be encoded as JSON. The
+        threads and queue of the waitress ``dispatcher`` are included if
+        given."""
+        with self.lock:
+            latencies = list(self.latencies)
+            paths = {path: list(samples)
+                     for path, samples in self.paths.items()}
+            data = {'requests': self.requests, 'in_flight': self.in_flight}
+        data['latency'] = percentiles(latencies)
+        data['paths'] = {path: {'count': len(samples),
+                                'latency': percentiles(samples)}
+                         for path, samples in sorted(paths.items())}
+        if dispatcher is not None:
+            with dispatcher.lock:
+                threads = len(dispatcher.threads) - dispatcher.stop_count
+                active = dispatcher.active_count
+                queue = len(dispatcher.queue)
+            data['server'] = {
+                'threads': threads,
+                'active_threads': active,
+                'queue': queue,
+                'utilization': round(active / threads, 3) if threads else 0,
+            }
+        return data
+
+
+class _MetricsIterator:
+    """Record the end of a request when its response is closed"""
+
+    __slots__ = ('app_iter', 'metrics', 'path', 'start')
+
+    def __init__(self, app_iter, metrics, path, start):
+        self.app_iter = app_iter
+        self.metrics = metrics
+        self.path = path
+        self.start = start
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.metrics.finish(self.path, self.start)
+
+
+class _SizedMetricsIterator(_MetricsIterator):
+    """Keep the length of the response, used by waitress to set the
+    ``Content-Length``"""
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.app_iter)
+
+
 class StopableWSGIServer(TcpWSGIServer):
     """StopableWSGIServer is a TcpWSGIServer which run in a separated thread.
     This allow to use tools like casperjs or selenium.
 
     Server instance have an ``application_url`` attribute formatted with the
     server host and port.
+
+    The socket is listening once the server is created so the ``ready``
+    event is set as soon as :meth:`run` starts.
     """
 
     was_shutdown = False
 
+    #: number of files kept in the cache of the ``__file__`` route
+    file_cache_size = 32
+    #: size of the chunks used to stream files
+    file_block_size = 64 * 1024
+
     def __init__(self, application, *args, **kwargs):
         super().__init__(self.wrapper, *args, **kwargs)
         self.runner = None
+        self.ready = threading.Event()
+        self.workers = []
+        self.workers_ready = 0
+        self._ready_fd = None
+        self._alive_fd = None
+        self.file_cache = {}
+        self.file_cache_lock = threading.Lock()
+        self.metrics = ServerMetrics()
         self.test_app = application
+        _servers.add(self)
+        if self.adj.port == 0 and \
+                self.family in (socket.AF_INET, socket.AF_INET6):
+            # bound to port 0: use the port chosen by the system
+            self.adj.port = int(self.effective_port)
         self.application_url = f'http://{self.adj.host}:{self.adj.port}/'
 
     def wrapper(self, environ, start_response):
@@ -63,26 +472,144 @@ class StopableWSGIServer(TcpWSGIServer):
         ``/__application__``: allow to ping the server.
 
         ``/__file__?__file__={path}``: serve the file found at ``path``
+        (see :meth:`serve_file`)
+
+        ``/__metrics__``: the :class:`ServerMetrics` of the requests served
+        by the application, as JSON (see :meth:`serve_metrics`)
+        """
+        path_info = environ['PATH_INFO']
+        if '__file__' in path_info:
+            return self.serve_file(environ, start_response)
+        elif '__application__' in path_info:
+            return webob.Response('server started')(environ, start_response)
+        elif '__metrics__' in path_info:
+            return self.serve_metrics(environ, start_response)
+        metrics = self.metrics
+        start = metrics.start()
+        try:
+            app_iter = self.test_app(environ, start_response)
+        except BaseException:
+            metrics.finish(path_info, start)
+            raise
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(app_iter, (list, tuple)) or (
+                isinstance(file_wrapper, type) and
+                isinstance(app_iter, file_wrapper)):
+            # given as is to the server, which handles them specially
+            metrics.finish(path_info, start)
+            return app_iter
+        if hasattr(app_iter, '__len__'):
+            return _SizedMetricsIterator(app_iter, metrics, path_info, start)
+        return _MetricsIterator(app_iter, metrics, path_info, start)
+
+    def serve_metrics(self, environ, start_response):
+        """Serve the metrics of the server as JSON: the number of requests
+        and their latency percentiles, in milliseconds, for all the
+        requests and per path, the requests in flight and the threads and
+        queue of the waitress dispatcher. The metrics are reset after
+        being read if the query string contains ``reset``.
+
+        With ``workers``, each process has its own metrics.
+        """
+        req = webob.Request(environ)
+        data = self.metrics.as_dict(self.task_dispatcher)
+        if 'reset' in req.GET:
+            self.metrics.reset()
+        resp = webob.Response(content_type='application/json',
+                              charset=None)
+        resp.body = json.dumps(data, sort_keys=True).encode('utf-8')
+        return resp(environ, start_response)
+
+    def serve_file(self, environ, start_response):
+        """Serve the file given by the ``__file__`` parameter.
+
+        ``http://localhost/`` is replaced by the url of the server in the
+        file. The result is cached per path, mtime, size and host, and an
+        ``ETag`` allows browsers to revalidate it with ``If-None-Match``.
+        Files which contain no url to replace are streamed with
+        ``wsgi.file_wrapper``.
         """
-        if '__file__' in environ['PATH_INFO']:
-            req = webob.Request(environ)
-            resp = webob.Response()
-            resp.content_type = 'text/html; charset=UTF-8'
-            filename = req.params.get('__file__')
-            if os.path.isfile(filename):
-                body = open(filename, 'rb').read()
-                body = body.replace(b'http://localhost/',
-                                    bytes('http://%s/' % req.host, 'UTF-8'))
-                resp.body = body
+        req = webob.Request(environ)
+        resp = webob.Response()
+        resp.content_type = 'text/html; charset=UTF-8'
+        filename = req.params.get('__file__')
+        try:
+            st = os.stat(filename)
+        except (OSError, TypeError, ValueError):
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            resp.status = '404 Not Found'
+            return resp(environ, start_response)
+
+        host = req.host
+        version = (st.st_mtime_ns, st.st_size)
+        data = None
+        with self.file_cache_lock:
+            entry = self.file_cache.get(filename)
+            if entry is None or entry[0] != version:
+                entry = None
             else:
-                resp.status = '404 Not Found'
+                # most recently used last
+                self.file_cache[filename] = self.file_cache.pop(filename)
+        if entry is None:
+            with open(filename, 'rb') as fd:
+                data = fd.read()
+            entry = (version, b'http://localhost/' in data, {})
+            self._cache_file(filename, entry)
+        _, rewrite, bodies = entry
+
+        etag = '%x-%x' % version
+        if rewrite:
+            etag += '-%08x' % zlib.crc32(host.encode('utf-8'))
+        resp.etag = etag
+        if etag in req.if_none_match:
+            resp.status = '304 Not Modified'
+            del resp.content_type
             return resp(environ, start_response)
-        elif '__application__' in environ['PATH_INFO']:
-            return webob.Response('server started')(environ, start_response)
-        return self.test_app(environ, start_response)
+
+        if rewrite:
+            body = bodies.get(host)
+            if body is None:
+                if data is None:
+                    with open(filename, 'rb') as fd:
+                        data = fd.read()
+                body = data.replace(b'http://localhost/',
+                                    bytes('http://%s/' % host, 'UTF-8'))
+                bodies[host] = body
+            resp.body = body
+        elif data is not None:
+            resp.body = data
+        else:
+            fd = open(filename, 'rb')
+            file_wrapper = environ.get('wsgi.file_wrapper', file_iter)
+            resp.app_iter = file_wrapper(fd, self.file_block_size)
+            resp.content_length = st.st_size
+        return resp(environ, start_response)
+
+    def _cache_file(self, filename, entry):
+        with self.file_cache_lock:
+            self.file_cache.pop(filename, None)
+            self.file_cache[filename] = entry
+            while len(self.file_cache) > self.file_cache_size:
+                del self.file_cache[next(iter(self.file_cache))]
+
+    def swap_app(self, application):
+        """Serve ``application`` instead of the current application, which
+        is returned. Requests already started finish with the previous
+        application.
+
+        Not available with ``workers``: the workers are separate processes
+        and keep serving the application they were forked with."""
+        if self.workers:
+            raise RuntimeError(
+                'The application of a server with workers can not be '
+                'swapped')
+        previous, self.test_app = self.test_app, application
+        return previous
 
     def run(self):
         """Run the server"""
+        self.ready.set()
         try:
             self.asyncore.loop(.5, map=self._map)
         except OSError:  # pragma: no cover
@@ -94,6 +621,7 @@ class StopableWSGIServer(TcpWSGIServer):
         # avoid showing traceback related to asyncore
         self.was_shutdown = True
         self.logger.setLevel(logging.FATAL)
+        self._stop_workers()
         while self._map:
             triggers = list(self._map.values())
             for trigger in triggers:
@@ -103,29 +631,294 @@ class StopableWSGIServer(TcpWSGIServer):
         return True
 
     @classmethod
-    def create(cls, application, **kwargs):
+    def create(cls, application, workers=None, unix_socket=None,
+               port_range=None, **kwargs):
         """Start a server to serve ``application``. Return a server
-        instance."""
-        host, port = get_free_port()
-        if 'port' not in kwargs:
-            kwargs['port'] = port
-        if 'host' not in kwargs:
-            kwargs['host'] = host
+        instance.
+
+        The server listens on ``$WEBTEST_SERVER_BIND`` or ``127.0.0.1``
+        and a port chosen by the system when the socket is bound, unless a
+        ``host`` and a ``port`` are given. If ``port_range`` is given, or
+        ``$WEBTEST_PORT_RANGE`` is set, the port is the first free port of
+        this :class:`PortRange`.
+
+        If ``workers`` is given, the socket is shared by ``workers``
+        processes forked from the current one, each with its own threads,
+        instead of being served by a thread of the current process. Only
+        available on POSIX systems.
+
+        If ``unix_socket`` is given, the server listens on this unix socket
+        instead of a TCP port. ``StopableWSGIServer.create()`` then returns
+        a :class:`StopableUnixWSGIServer`; a subclass must inherit from
+        :class:`StopableUnixWSGIServer` to listen on a unix socket, else a
+        :class:`TypeError` is raised."""
+        if unix_socket is not None:
+            if StopableUnixWSGIServer is None:  # pragma: no cover
+                raise NotImplementedError('unix sockets are not available')
+            if cls is StopableWSGIServer:
+                cls = StopableUnixWSGIServer
+            elif not issubclass(cls, StopableUnixWSGIServer):
+                raise TypeError(
+                    '%s can not listen on a unix socket: inherit from '
+                    'StopableUnixWSGIServer' % cls.__name__)
+            kwargs['unix_socket'] = unix_socket
+        else:
+            if 'host' not in kwargs:
+                kwargs['host'] = get_bind_host()
+            if 'port' not in kwargs:
+                if port_range is None:
+                    port_range = PortRange.from_environ()
+                if port_range is None:
+                    kwargs['port'] = 0
+                else:
+                    sock = port_range.bind(kwargs['host'])
+                    kwargs.update(port=sock.getsockname()[1], _sock=sock,
+                                  bind_socket=False)
         if 'expose_tracebacks' not in kwargs:
             kwargs['expose_tracebacks'] = True
+        if workers:
+            return cls._create_workers(application, workers, kwargs)
         server = cls(application, **kwargs)
         server.runner = threading.Thread(target=server.run)
         server.runner.daemon = True
         server.runner.start()
         return server
 
+    @classmethod
+    def _create_workers(cls, application, workers, kwargs):
+        if not hasattr(os, 'fork'):  # pragma: no cover
+            raise NotImplementedError('workers require os.fork()')
+        # the server of the current process only holds the socket; it
+        # does not need threads
+        server = cls(application, dispatcher=ThreadedTaskDispatcher(),
+                     **kwargs)
+        kwargs.pop('_sock', None)
+        kwargs.pop('bind_socket', None)
+        if 'unix_socket' not in kwargs:
+            kwargs['port'] = server.adj.port
+        read_fd, write_fd = os.pipe()
+        # the workers exit when this pipe is closed by the death of the
+        # current process
+        alive_read_fd, alive_write_fd = os.pipe()
+        for i in range(workers):
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                # the coverage of the worker processes is not collected
+                status = 1
+                try:
+                    os.close(read_fd)
+                    os.close(alive_write_fd)
+                    _close_other_servers(server)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    watcher = threading.Thread(target=_exit_with_parent,
+                                               args=(alive_read_fd,))
+                    watcher.daemon = True
+                    watcher.start()
+                    worker = cls(application, _sock=server.socket,
+                                 bind_socket=False, **kwargs)
+                    os.write(write_fd, b'.')
+                    os.close(write_fd)
+                    worker.run()
+                    status = 0
+                finally:
+                    os._exit(status)
+            server.workers.append(pid)
+        os.close(write_fd)
+        os.close(alive_read_fd)
+        server._ready_fd = read_fd
+        server._alive_fd = alive_write_fd
+        return server
+
+    def _wait_workers(self, timeout):
+        deadline = time.monotonic() + timeout
+        while self.workers_ready < len(self.workers):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self._ready_fd], [], [],
+                                           remaining)
+            if readable:
+                data = os.read(self._ready_fd, len(self.workers))
+                if not data:
+                    # all the workers exited
+                    return False
+                self.workers_ready += len(data)
+        return True
+
+    def _stop_workers(self):
+        workers, self.workers = self.workers, []
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:  # pragma: no cover
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:  # pragma: no cover
+                pass
+        if self._ready_fd is not None:
+            os.close(self._ready_fd)
+            self._ready_fd = None
+        if self._alive_fd is not None:
+            os.close(self._alive_fd)
+            self._alive_fd = None
+
     def wait(self, retries=30):
         """Wait until the server is started"""
-        running = check_server(self.adj.host, self.adj.port,
-                               '/__application__', retries=retries)
+        if self.workers and retries >= 0:
+            running = self._wait_workers(max(retries, 1) * .3)
+        elif self.runner is not None and retries >= 0:
+            # started by create(): wait for run() instead of polling
+            running = self.ready.wait(max(retries, 1) * .3)
+        else:
+            running = check_server(self.adj.host, self.adj.port,
+                                   '/__application__', retries=retries)
         if running:
             return True
         try:
             self.shutdown()
         finally:
             return False
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class StopableUnixWSGIServer(StopableWSGIServer):
+        """A :class:`StopableWSGIServer` listening on a unix socket. Its
+        ``application_url`` is a ``http+unix://`` url which can be given to
+        :class:`~webtest.app.TestApp`. Use
+        ``StopableWSGIServer.create(app, unix_socket=path)`` to start
+        one."""
+
+        def __init__(self, application, *args, **kwargs):
+            kwargs.setdefault(
+                'sockinfo', (socket.AF_UNIX, socket.SOCK_STREAM, None, None))
+            super().__init__(application, *args, **kwargs)
+            self.application_url = unix_socket_url(self.adj.unix_socket)
+
+        bind_server_socket = waitress_server.UnixWSGIServer.bind_server_socket
+        getsockname = waitress_server.UnixWSGIServer.getsockname
+        fix_addr = waitress_server.UnixWSGIServer.fix_addr
+
+        def set_socket_options(self, conn):
+            # the TCP options of the adjustments do not apply
+            pass
+
+        def shutdown(self):
+            """Shutdown the server and remove the socket"""
+            result = super().shutdown()
+            if os.path.exists(self.adj.unix_socket):
+                os.unlink(self.adj.unix_socket)
+            return result
+else:  # pragma: no cover
+    StopableUnixWSGIServer = None
+
+
+#: the servers created in this process, closed in the forked workers
+_servers = weakref.WeakSet()
+
+
+def _close_other_servers(server):  # pragma: no cover
+    # run by the workers: the sockets of the other servers, and of their
+    # connections, must not be kept open by the forked process. A server
+    # is in its own map until it is closed.
+    for other in list(_servers):
+        if other is server:
+            continue
+        for dispatcher in list(other._map.values()):
+            sock = getattr(dispatcher, 'socket', None)
+            if sock is not None:
+                sock.close()
+
+
+def _exit_with_parent(fd):  # pragma: no cover
+    # run by the workers: the parent never writes to the pipe so the read
+    # only returns when the parent closed it or died
+    try:
+        os.read(fd, 1)
+    finally:
+        os._exit(0)
+
+
+def idle_app(environ, start_response):
+    """The application of the servers which are not leased from a
+    :class:`ServerPool`"""
+    return webob.Response('No application', status=503)(
+        environ, start_response)
+
+
+class ServerPool:
+    """A pool of running :class:`StopableWSGIServer` which can be reused
+    to serve other applications, to avoid starting a server for each test::
+
+        pool = ServerPool()
+        server = pool.lease(app)
+        try:
+            browser.get(server.application_url)
+        finally:
+            pool.release(server)
+        ...
+        pool.close()
+
+    Keyword arguments are passed to :meth:`StopableWSGIServer.create`,
+    except ``workers``. :meth:`lease` and :meth:`release` can be called
+    from several threads.
+    """
+
+    def __init__(self, server_class=StopableWSGIServer, **kwargs):
+        if kwargs.get('workers'):
+            raise ValueError('A ServerPool can not use workers: their '
+                             'application can not be swapped')
+        self.server_class = server_class
+        self.kwargs = kwargs
+        self.lock = threading.Lock()
+        self.servers = []
+        self.idle = []
+        self.closed = False
+
+    def lease(self, application):
+        """Return a running server serving ``application``. An idle server
+        is reused if there is one, else a new server is started."""
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('The pool is closed')
+            server = self.idle.pop() if self.idle else None
+        if server is not None:
+            server.swap_app(application)
+            server.metrics.reset()
+            return server
+        server = self.server_class.create(application, **self.kwargs)
+        if not server.wait():
+            raise RuntimeError('Unable to start a server')
+        with self.lock:
+            self.servers.append(server)
+        return server
+
+    def release(self, server):
+        """Give back a server obtained from :meth:`lease`. It serves a
+        ``503`` until it is leased again."""
+        with self.lock:
+            if server not in self.servers:
+                raise ValueError('%r is not a server of this pool' % server)
+            if server in self.idle:
+                raise ValueError('%r is already released' % server)
+            server.swap_app(idle_app)
+            if not self.closed:
+                self.idle.append(server)
+                return
+        server.shutdown()
+
+    def close(self):
+        """Shutdown the idle servers. The servers still leased are shutdown
+        when released."""
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for server in idle:
+            server.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -113,8 +113,24 @@ Some of the things this checks:
     sys.stderr, because we only know it isn't called when the object
     is garbage collected).
 
+When enabled, the performance rules (see :class:`PerformanceStats`) emit a
+:class:`PerformanceWarning` for:
+
+* Response iterators yielding many tiny chunks.
+
+* wsgi.input read one byte or one line at a time.
+
+* Large responses sent in several chunks without a Content-Length.
+
+* Large text responses which are not compressed while the client accepts
+  gzip.
+
+* Use of the write() callable returned by start_response.
+
 """
 
+import collections
+import random
 import re
 import warnings
 
@@ -122,6 +138,10 @@ from webtest.compat import Iterable
 
 header_re = re.compile(r'^[a-zA-Z][a-zA-Z0-9\-_]*$')
 bad_header_value_re = re.compile(r'[\000-\037]')
+# header_re, without a trailing '-' or '_'
+valid_header_name_re = re.compile(r'[a-zA-Z](?:[a-zA-Z0-9\-_]*[a-zA-Z0-9])?\Z')
+# bad_header_value_re, or a non latin1 character
+invalid_header_value_re = re.compile(r'[^\040-\377]')
 
 valid_methods = (
     'GET', 'HEAD', 'POST', 'OPTIONS', 'PUT', 'DELETE',
@@ -148,7 +168,14 @@ class WSGIWarning(Warning):
     """
 
 
-def middleware(application, global_conf=None):
+class PerformanceWarning(WSGIWarning):
+    """
+    Raised when the application uses WSGI in a way known to be slow under
+    real servers
+    """
+
+
+def middleware(application, global_conf=None, performance=False):
 
     """
     When applied between a WSGI server and a WSGI application, this
@@ -158,66 +185,456 @@ def middleware(application, global_conf=None):
     (except for a failure to close the application iterator, which
     will be printed to stderr -- there's no way to throw an exception
     at that point).
-    """
 
-    def lint_app(*args, **kw):
-        assert len(args) == 2, "Two arguments required"
-        assert not kw, "No keyword arguments allowed"
-        environ, start_response = args
+    The returned :class:`LintMiddleware` can be reused for any number of
+    requests. When the environ contains a :class:`LintReport` as
+    ``webtest.lint_report``, violations are recorded in the report instead.
+
+    If ``performance`` is True, the performance rules are also checked.
+    """
+    return LintMiddleware(application, performance)
 
-        check_environ(environ)
 
-        # We use this to check if the application returns without
-        # calling start_response:
-        start_response_started = []
+class LintMiddleware:
+    """
+    The WSGI compliance checker returned by :func:`middleware`. It is
+    built once per application; only the wrappers around the request
+    streams, ``start_response`` and the response iterator are created for
+    each request.
+    """
 
-        def start_response_wrapper(*args, **kw):
-            assert len(args) == 2 or len(args) == 3, (
-                "Invalid number of arguments: %s" % args)
-            assert not kw, "No keyword arguments allowed"
-            status = args[0]
-            headers = args[1]
-            if len(args) == 3:
-                exc_info = args[2]
-            else:
-                exc_info = None
+    __slots__ = ('application', 'performance')
 
-            check_status(status)
-            check_headers(headers)
-            check_content_type(status, headers)
-            check_exc_info(exc_info)
+    def __init__(self, application, performance=False):
+        self.application = application
+        self.performance = performance
 
-            start_response_started.append(None)
-            return WriteWrapper(start_response(*args))
+    def __call__(self, *args, **kw):
+        assert len(args) == 2, "Two arguments required"
+        assert not kw, "No keyword arguments allowed"
+        environ, start_response = args
 
-        environ['wsgi.input'] = InputWrapper(environ['wsgi.input'])
+        report = environ.get('webtest.lint_report')
+        stats = None
+        if self.performance:
+            stats = PerformanceStats(environ, report)
+        if report is None:
+            check_environ(environ)
+            # We use this to check if the application returns without
+            # calling start_response:
+            start_response_wrapper = StartResponseWrapper(start_response,
+                                                          stats)
+        else:
+            # the environ is checked now as the application may change it
+            report.check(check_environ, environ)
+            start_response_wrapper = DeferredStartResponseWrapper(
+                start_response, report, stats)
+
+        if stats is None:
+            environ['wsgi.input'] = InputWrapper(environ['wsgi.input'])
+        else:
+            environ['wsgi.input'] = InputWrapper(environ['wsgi.input'], stats)
         environ['wsgi.errors'] = ErrorWrapper(environ['wsgi.errors'])
 
-        iterator = application(environ, start_response_wrapper)
+        iterator = self.application(environ, start_response_wrapper)
         if not isinstance(iterator, Iterable):
             raise AssertionError(
                 "The application must return an iterator, if only an empty list"
             )
 
-        check_iterator(iterator)
+        if report is None:
+            check_iterator(iterator)
+        else:
+            report.check(check_iterator, iterator)
+
+        return IteratorWrapper(iterator, start_response_wrapper, stats)
+
+
+class LintPolicy:
+    """
+    Decide which requests of a :class:`~webtest.app.TestApp` are checked by
+    the lint middleware. Pass it as the ``lint`` argument of ``TestApp``.
+
+    :param sample:
+        The fraction of requests to check, between 0 and 1. The first
+        request of each route (method and path) is always checked and the
+        others are picked by a random generator seeded with ``seed``, so a
+        test suite always lints the same requests.
+    :type sample:
+        float
+    :param seed:
+        The seed of the random generator used to sample requests.
+    :param collect:
+        If True, violations do not fail the request. They are recorded in
+        ``res.lint_report`` (a :class:`LintReport`) and counted in the
+        :class:`LintSummary` of the policy.
+    :param performance:
+        If True, also check the performance rules of
+        :class:`PerformanceStats`.
+
+    A policy can also be given as a string of comma separated options:
+    ``'sample:0.05'`` is the same as ``LintPolicy(sample=0.05)``,
+    ``'collect'`` the same as ``LintPolicy(collect=True)`` and
+    ``'performance'`` the same as ``LintPolicy(performance=True)``.
+    """
+
+    def __init__(self, sample=1.0, seed=0, collect=False, performance=False):
+        if not 0 <= sample <= 1:
+            raise ValueError("sample must be between 0 and 1: %r" % sample)
+        self.sample = sample
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.routes = set()
+        self.collect = collect
+        self.summary = LintSummary() if collect else None
+        self.performance = performance
+
+    @classmethod
+    def from_string(cls, value):
+        """Build a policy from a string like ``'sample:0.05'``"""
+        options = {}
+        for option in value.split(','):
+            name, _, arg = option.strip().partition(':')
+            if name in ('collect', 'performance') and not arg:
+                options[name] = True
+                continue
+            if name == 'sample' and arg:
+                try:
+                    options['sample'] = float(arg)
+                except ValueError:
+                    pass
+                else:
+                    continue
+            raise ValueError("Invalid lint policy: %r" % value)
+        return cls(**options)
+
+    def should_lint(self, req):
+        """Return True if ``req`` must be checked"""
+        if self.sample >= 1:
+            return True
+        route = (req.method, req.path_info)
+        if route not in self.routes:
+            self.routes.add(route)
+            return True
+        return self.random.random() < self.sample
+
+    def __repr__(self):
+        return '<LintPolicy sample=%r seed=%r%s%s>' % (
+            self.sample, self.seed, ' collect' if self.collect else '',
+            ' performance' if self.performance else '')
+
+
+LintViolation = collections.namedtuple('LintViolation',
+                                       ['rule', 'message', 'level'])
+
+
+class LintReport:
+    """The lint violations of a single request, available as
+    ``res.lint_report`` in collect mode.
+
+    Each violation is a :class:`LintViolation` ``(rule, message, level)``
+    where ``rule`` is the name of the check (``'environ'``, ``'status'``,
+    ``'headers'``, ``'content_type'``, ...) and ``level`` is ``'error'``
+    for a failed assertion or ``'warning'`` for a :class:`WSGIWarning`.
+
+    The checks of the arguments given to ``start_response`` are deferred
+    until :meth:`finish` is called, after the response has been consumed.
+    """
+
+    __slots__ = ('violations', 'start_response_args')
+
+    def __init__(self):
+        self.violations = []
+        self.start_response_args = None
+
+    def add(self, rule, message, level='error'):
+        self.violations.append(LintViolation(rule, message, level))
+
+    def check(self, check, *args):
+        """Run ``check(*args)`` and record the assertion it raises and the
+        warnings it emits. Return True if it did not raise."""
+        rule = check.__name__[len('check_'):]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', WSGIWarning)
+            try:
+                check(*args)
+            except AssertionError as e:
+                self.add(rule, str(e))
+                return False
+            finally:
+                for warning in caught:
+                    if issubclass(warning.category, WSGIWarning):
+                        self.add(rule, str(warning.message), 'warning')
+                    else:  # pragma: no cover
+                        warnings.warn_explicit(
+                            warning.message, warning.category,
+                            warning.filename, warning.lineno)
+        return True
+
+    def finish(self):
+        """Run the deferred checks"""
+        if self.start_response_args is None:
+            return
+        status, headers, exc_info = self.start_response_args
+        self.start_response_args = None
+        if self.check(check_status, status) and \
+                self.check(check_headers, headers):
+            self.check(check_content_type, status, headers)
+        self.check(check_exc_info, exc_info)
+
+    @property
+    def errors(self):
+        return [v for v in self.violations if v.level == 'error']
+
+    @property
+    def warnings(self):
+        return [v for v in self.violations if v.level == 'warning']
+
+    def __bool__(self):
+        return bool(self.violations)
+
+    def __len__(self):
+        return len(self.violations)
+
+    def __iter__(self):
+        return iter(self.violations)
+
+    def __str__(self):
+        return '\n'.join('%s %s: %s' % (v.level, v.rule, v.message)
+                         for v in self.violations)
+
+
+class LintSummary:
+    """The violations collected during a session, available as
+    ``app.lint_summary`` when the ``TestApp`` lints in collect mode.
+
+    .. attribute:: rules
+
+        A :class:`collections.Counter` of the violations per rule.
+
+    .. attribute:: routes
+
+        A :class:`collections.Counter` of the violations per
+        ``(method, path)``.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.rules = collections.Counter()
+        self.routes = collections.Counter()
+
+    def add(self, req, report):
+        """Count the violations of ``report``, the report of ``req``"""
+        self.requests += 1
+        if report:
+            route = (req.method, req.path_info)
+            for violation in report:
+                self.rules[violation.rule] += 1
+                self.routes[route] += 1
+
+    def reset(self):
+        self.requests = 0
+        self.rules.clear()
+        self.routes.clear()
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def __str__(self):
+        lines = ['%d violations in %d requests' % (
+            sum(self.rules.values()), self.requests)]
+        if self.rules:
+            lines.append('By rule:')
+            lines.extend('  %-20s %6d' % item
+                         for item in self.rules.most_common())
+            lines.append('By route:')
+            lines.extend('  %-20s %6d' % ('%s %s' % route, count)
+                         for route, count in self.routes.most_common())
+        return '\n'.join(lines)
+
+
+class PerformanceStats:
+    """
+    Count what the application does during a request and check the
+    performance rules when the response iterator is closed. Each rule
+    emits a :class:`PerformanceWarning`, or records a warning in the
+    :class:`LintReport` in collect mode:
+
+    - ``tiny_chunks``: more than :attr:`max_small_chunks` chunks smaller
+      than :attr:`small_chunk` bytes are yielded by the response iterator.
+      Each chunk may be a write to the socket.
+    - ``input_reads``: ``wsgi.input`` is read one byte, or one line, at a
+      time more than :attr:`max_input_reads` times.
+    - ``content_length``: a response larger than :attr:`large_body` bytes
+      is sent in several chunks without a ``Content-Length``, forcing
+      chunked encoding or closing the connection.
+    - ``compression``: a text response larger than :attr:`compress_size`
+      bytes is not compressed while the request accepts gzip.
+    - ``write``: the ``write()`` callable returned by ``start_response`` is
+      used. It blocks the server on each call.
+
+    The thresholds are class attributes which can be changed.
+    """
+
+    small_chunk = 256
+    max_small_chunks = 16
+    max_input_reads = 64
+    large_body = 64 * 1024
+    compress_size = 16 * 1024
+    text_types = ('text/', 'application/json', 'application/javascript',
+                  'application/xml', 'image/svg+xml')
+
+    __slots__ = ('report', 'accept_gzip', 'headers', 'chunks',
+                 'small_chunks', 'body_size', 'byte_reads', 'line_reads',
+                 'writes')
+
+    def __init__(self, environ, report=None):
+        self.report = report
+        self.accept_gzip = 'gzip' in environ.get('HTTP_ACCEPT_ENCODING', '')
+        self.headers = None
+        self.chunks = self.small_chunks = self.body_size = 0
+        self.byte_reads = self.line_reads = self.writes = 0
+
+    def add_chunk(self, chunk):
+        size = len(chunk)
+        self.chunks += 1
+        self.body_size += size
+        if size < self.small_chunk:
+            self.small_chunks += 1
+
+    def warn(self, rule, message):
+        if self.report is None:
+            warnings.warn(message, PerformanceWarning)
+        else:
+            self.report.add(rule, message, 'warning')
+
+    def _header(self, name):
+        for header, value in self.headers or ():
+            if header.lower() == name:
+                return value
+        return None
+
+    def finish(self):
+        """Check the rules"""
+        if self.small_chunks > self.max_small_chunks:
+            self.warn('tiny_chunks', (
+                "The application iterator yielded %d chunks smaller than %d "
+                "bytes (%d chunks, %d bytes). Join them in larger chunks."
+            ) % (self.small_chunks, self.small_chunk, self.chunks,
+                 self.body_size))
+        if self.byte_reads > self.max_input_reads:
+            self.warn('input_reads', (
+                "wsgi.input was read one byte at a time (%d reads). "
+                "Read larger blocks." % self.byte_reads))
+        if self.line_reads > self.max_input_reads:
+            self.warn('input_reads', (
+                "wsgi.input was read one line at a time (%d reads). "
+                "Read larger blocks." % self.line_reads))
+        if self.writes:
+            self.warn('write', (
+                "The write() callable returned by start_response was "
+                "called %d times. Return an iterable instead." % self.writes))
+        if self.body_size > self.large_body and self.chunks > 1 and \
+                self._header('content-length') is None:
+            self.warn('content_length', (
+                "The response has %d bytes in %d chunks but no "
+                "Content-Length header.") % (self.body_size, self.chunks))
+        if self.accept_gzip and self.body_size > self.compress_size and \
+                self._header('content-encoding') is None:
+            content_type = (self._header('content-type') or '').lower()
+            if content_type.startswith(self.text_types):
+                self.warn('compression', (
+                    "The %s response has %d bytes but is not compressed "
+                    "while the client accepts gzip."
+                ) % (content_type.split(';')[0], self.body_size))
+
+
+class StartResponseWrapper:
+    """Check the arguments given to ``start_response``. It is true once
+    ``start_response`` has been called."""
+
+    __slots__ = ('start_response', 'called', 'stats')
+
+    def __init__(self, start_response, stats=None):
+        self.start_response = start_response
+        self.called = False
+        self.stats = stats
+
+    def __call__(self, *args, **kw):
+        assert len(args) == 2 or len(args) == 3, (
+            "Invalid number of arguments: %s" % (args,))
+        assert not kw, "No keyword arguments allowed"
+        status = args[0]
+        headers = args[1]
+        if len(args) == 3:
+            exc_info = args[2]
+        else:
+            exc_info = None
+
+        check_status(status)
+        content_type, length = _scan_headers(headers)
+        _check_content_type(status, headers, content_type, length)
+        check_exc_info(exc_info)
+        if self.stats is not None:
+            self.stats.headers = headers
+
+        self.called = True
+        return WriteWrapper(self.start_response(*args), self.stats)
+
+    def __bool__(self):
+        return self.called
+
 
-        return IteratorWrapper(iterator, start_response_started)
+class DeferredStartResponseWrapper(StartResponseWrapper):
+    """Keep the arguments given to ``start_response`` to check them once
+    the response is done, see :meth:`LintReport.finish`"""
 
-    return lint_app
+    __slots__ = ('report',)
+
+    def __init__(self, start_response, report, stats=None):
+        super().__init__(start_response, stats)
+        self.report = report
+
+    def __call__(self, *args, **kw):
+        assert len(args) == 2 or len(args) == 3, (
+            "Invalid number of arguments: %s" % (args,))
+        assert not kw, "No keyword arguments allowed"
+        status = args[0]
+        headers = args[1]
+        if len(args) == 3:
+            exc_info = args[2]
+        else:
+            exc_info = None
+        if type(headers) is list:
+            # the response may change the list before the checks run
+            headers = headers[:]
+        self.report.start_response_args = (status, headers, exc_info)
+        if self.stats is not None:
+            self.stats.headers = headers
+
+        self.called = True
+        return WriteWrapper(self.start_response(*args), self.stats)
 
 
 class InputWrapper:
 
-    def __init__(self, wsgi_input):
+    __slots__ = ('input', 'stats')
+
+    def __init__(self, wsgi_input, stats=None):
         self.input = wsgi_input
+        self.stats = stats
 
     def read(self, *args):
         assert len(args) <= 1
+        if self.stats is not None and args and args[0] == 1:
+            self.stats.byte_reads += 1
         v = self.input.read(*args)
         assert type(v) is bytes
         return v
 
     def readline(self, *args):
+        if self.stats is not None:
+            self.stats.line_reads += 1
         v = self.input.readline(*args)
         assert type(v) is bytes
         return v
@@ -246,6 +663,8 @@ class InputWrapper:
 
 class ErrorWrapper:
 
+    __slots__ = ('errors',)
+
     def __init__(self, wsgi_errors):
         self.errors = wsgi_errors
 
@@ -265,21 +684,30 @@ class ErrorWrapper:
 
 class WriteWrapper:
 
-    def __init__(self, wsgi_writer):
+    __slots__ = ('writer', 'stats')
+
+    def __init__(self, wsgi_writer, stats=None):
         self.writer = wsgi_writer
+        self.stats = stats
 
     def __call__(self, s):
         assert type(s) is bytes
+        if self.stats is not None:
+            self.stats.writes += 1
         self.writer(s)
 
 
 class IteratorWrapper:
 
-    def __init__(self, wsgi_iterator, check_start_response):
+    __slots__ = ('original_iterator', 'iterator', 'closed',
+                 'check_start_response', 'stats')
+
+    def __init__(self, wsgi_iterator, check_start_response, stats=None):
         self.original_iterator = wsgi_iterator
         self.iterator = iter(wsgi_iterator)
         self.closed = False
         self.check_start_response = check_start_response
+        self.stats = stats
 
     def __iter__(self):
         return self
@@ -296,12 +724,17 @@ class IteratorWrapper:
         assert isinstance(v, bytes), (
             "Iterator %r returned a non-%r object: %r"
             % (self.iterator, bytes, v))
+        if self.stats is not None:
+            self.stats.add_chunk(v)
         return v
 
     __next__ = next
 
     def close(self):
         self.closed = True
+        if self.stats is not None:
+            self.stats.finish()
+            self.stats = None
         if hasattr(self.original_iterator, 'close'):
             self.original_iterator.close()
 
@@ -338,14 +771,14 @@ def check_environ(environ):
             'so application errors are more likely',
             WSGIWarning)
 
-    for key in environ:
+    for key, value in environ.items():
         if '.' in key:
             # Extension, we don't care about its type
             continue
-        if type(environ[key]) not in METADATA_TYPE:
+        if type(value) not in METADATA_TYPE:
             raise AssertionError(
                 "Environmental variable %s is not a string: %r (value: %r)"
-                % (key, type(environ[key]), environ[key])
+                % (key, type(value), value)
             )
 
     if type(environ['wsgi.version']) is not tuple:
@@ -397,22 +830,34 @@ def check_environ(environ):
         )
 
 
-def check_input(wsgi_input):
-    for attr in ['read', 'readline', 'readlines', '__iter__']:
-        if not hasattr(wsgi_input, attr):
+# Types known to provide all the methods required for wsgi.input and
+# wsgi.errors, so instances don't need to be checked again
+_valid_input_types = set()
+_valid_errors_types = set()
+
+
+def _check_stream(stream, attrs, valid_types, name):
+    stream_type = type(stream)
+    if stream_type in valid_types:
+        return
+    for attr in attrs:
+        if not hasattr(stream, attr):
             raise AssertionError(
-                "wsgi.input (%r) doesn't have the attribute %s"
-                % (wsgi_input, attr)
+                "%s (%r) doesn't have the attribute %s"
+                % (name, stream, attr)
             )
+    if all(hasattr(stream_type, attr) for attr in attrs):
+        valid_types.add(stream_type)
+
+
+def check_input(wsgi_input):
+    _check_stream(wsgi_input, ('read', 'readline', 'readlines', '__iter__'),
+                  _valid_input_types, 'wsgi.input')
 
 
 def check_errors(wsgi_errors):
-    for attr in ['flush', 'write', 'writelines']:
-        if not hasattr(wsgi_errors, attr):
-            raise AssertionError(
-                "wsgi.errors (%r) doesn't have the attribute %s"
-                % (wsgi_errors, attr)
-            )
+    _check_stream(wsgi_errors, ('flush', 'write', 'writelines'),
+                  _valid_errors_types, 'wsgi.errors')
 
 
 def check_status(status):
@@ -458,12 +903,60 @@ def _assert_latin1_str(string, message):
     return string
 
 
-def check_headers(headers):
+def _check_header(name, value):
+    # The detailed checks of a header, only run to report what is wrong
+    # with a header rejected by check_headers()
+    _assert_latin1_str(
+        name,
+        "Header names must be latin1 string "
+        "(not Py2 unicode or Py3 bytes type). "
+        "%r is not a valid latin1 string" % (name,)
+    )
+
+    if name.lower() == 'status':
+        raise AssertionError(
+            "The Status header cannot be used; it conflicts with CGI "
+            "script, and HTTP status is not given through headers "
+            "(value: %r)." % value
+        )
+
+    if '\n' in name or ':' in name:
+        raise AssertionError(
+            "Header names may not contain ':' or '\\n': %r" % name
+        )
+
+    if not header_re.search(name):
+        raise AssertionError("Bad header name: %r" % name)
+
+    if name.endswith('-') or name.endswith('_'):
+        raise AssertionError("Names may not end in '-' or '_': %r" % name)
+
+    _assert_latin1_str(
+        value,
+        "Header values must be latin1 string "
+        "(not Py2 unicode or Py3 bytes type)."
+        "%r is not a valid latin1 string" % (value,)
+    )
+
+    if bad_header_value_re.search(value):
+        raise AssertionError(
+            "Bad header value: %r (bad char: %r)"
+            % (value, bad_header_value_re.search(value).group(0))
+        )
+
+
+def _scan_headers(headers):
+    """Check all the headers in a single pass. Return the value of the
+    first ``Content-Type`` header (or None) and the first numeric
+    ``Content-Length`` (or None)."""
     if type(headers) is not list:
         raise AssertionError(
             f"Headers ({headers!r}) must be of type list: {type(headers)!r}"
         )
 
+    content_type = length = None
+    valid_name = valid_header_name_re.match
+    invalid_value = invalid_header_value_re.search
     for item in headers:
         if type(item) is not tuple:
             raise AssertionError(
@@ -473,70 +966,52 @@ def check_headers(headers):
 
         assert len(item) == 2
         name, value = item
-        _assert_latin1_str(
-            name,
-            "Header names must be latin1 string "
-            "(not Py2 unicode or Py3 bytes type). "
-            "%r is not a valid latin1 string" % (name,)
-        )
-
-        if name.lower() == 'status':
-            raise AssertionError(
-                "The Status header cannot be used; it conflicts with CGI "
-                "script, and HTTP status is not given through headers "
-                "(value: %r)." % value
-            )
+        if type(name) is not str or not valid_name(name) or \
+                type(value) is not str or invalid_value(value):
+            _check_header(name, value)
+        # only the names of the headers we care about have these lengths
+        name_len = len(name)
+        if name_len in (6, 12, 14):
+            name = name.lower()
+            if name == 'status':
+                _check_header(name, value)
+            elif name == 'content-type':
+                if content_type is None:
+                    content_type = value
+            elif name == 'content-length':
+                if length is None and value.isdigit():
+                    length = int(value)
+    return content_type, length
 
-        if '\n' in name or ':' in name:
-            raise AssertionError(
-                "Header names may not contain ':' or '\\n': %r" % name
-            )
 
-        if not header_re.search(name):
-            raise AssertionError("Bad header name: %r" % name)
-
-        if name.endswith('-') or name.endswith('_'):
-            raise AssertionError("Names may not end in '-' or '_': %r" % name)
+def check_headers(headers):
+    _scan_headers(headers)
 
-        _assert_latin1_str(
-            value,
-            "Header values must be latin1 string "
-            "(not Py2 unicode or Py3 bytes type)."
-            "%r is not a valid latin1 string" % (value,)
-        )
 
-        if bad_header_value_re.search(value):
-            raise AssertionError(
-                "Bad header value: %r (bad char: %r)"
-                % (value, bad_header_value_re.search(value).group(0))
-            )
+def check_content_type(status, headers):
+    content_type, length = _scan_headers(headers)
+    _check_content_type(status, headers, content_type, length)
 
 
-def check_content_type(status, headers):
+def _check_content_type(status, headers, content_type, length):
     code = int(status.split(None, 1)[0])
     # @@: need one more person to verify this interpretation of RFC 2616
     #     http://www.w3.org/Protocols/rfc2616/rfc2616-sec10.html
     NO_MESSAGE_BODY = (201, 204, 304)
     NO_MESSAGE_TYPE = (204, 304)
-    length = None
-    for name, value in headers:
-        if name.lower() == 'content-length' and value.isdigit():
-            length = int(value)
-            break
-    for name, value in headers:
-        if name.lower() == 'content-type':
-            if code not in NO_MESSAGE_TYPE:
-                return
-            elif not length:
-                warnings.warn(("Content-Type header found in a %s response, "
-                               "which should not return content.") % code,
-                              WSGIWarning)
-                return
-            else:
-                raise AssertionError(
-                    "Content-Type header found in a %s response, "
-                    "which must not return content." % code
-                )
+    if content_type is not None:
+        if code not in NO_MESSAGE_TYPE:
+            return
+        elif not length:
+            warnings.warn(("Content-Type header found in a %s response, "
+                           "which should not return content.") % code,
+                          WSGIWarning)
+            return
+        else:
+            raise AssertionError(
+                "Content-Type header found in a %s response, "
+                "which must not return content." % code
+            )
 
     if code not in NO_MESSAGE_BODY and length is not None and length > 0:
         raise AssertionError(
@@ -564,4 +1039,5 @@ def check_iterator(iterator):
             "instead return a single-item list containing that string."
         )
 
-__all__ = ['middleware']
+__all__ = ['middleware', 'LintMiddleware', 'LintPolicy', 'LintReport',
+           'LintSummary', 'PerformanceStats', 'PerformanceWarning']
@@ -0,0 +1,369 @@
+"""
+Helpers used by :class:`~webtest.app.TestApp` to measure what happens
+while a request goes through the application.
+"""
+
+import fnmatch
+import importlib
+import itertools
+import os
+import pstats
+import re
+import tracemalloc
+
+from time import perf_counter
+
+import webob
+
+
+__all__ = ['match_path', 'profile_stats', 'parse_size', 'MemoryReport',
+           'Timings', 'RequestTimer', 'AppTimer']
+
+_slug_re = re.compile(r'[^A-Za-z0-9_.-]+')
+_profile_counter = itertools.count(1)
+
+
+def match_path(patterns, path):
+    """Return True if ``path`` is selected by ``patterns``.
+
+    ``patterns`` may be a boolean, a shell-style wildcard like
+    ``'/reports/*'`` or a list of wildcards.
+    """
+    if patterns is None or isinstance(patterns, bool):
+        return bool(patterns)
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(path, pattern):
+            return True
+    return False
+
+
+def profile_filename(req):
+    """Return a file name unique to this process for the profile of
+    ``req``, like ``0001-GET-reports_daily.prof``"""
+    slug = _slug_re.sub('_', req.path_info).strip('_') or 'root'
+    return '%04d-%s-%s.prof' % (next(_profile_counter), req.method, slug)
+
+
+def profile_stats(profiler, req, directory=None):
+    """Return a :class:`pstats.Stats` for ``profiler``. The raw profile is
+    also dumped to ``directory``, one file per request, if given."""
+    if directory:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filename = os.path.join(directory, profile_filename(req))
+        profiler.dump_stats(filename)
+    return pstats.Stats(profiler)
+
+
+_size_re = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', re.I)
+_size_units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_size(value):
+    """Convert a size like ``'50MB'``, ``'512k'`` or ``1024`` to a number of
+    bytes. Units are powers of 1024. Numbers are a number of bytes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    m = _size_re.match(value)
+    if m is None:
+        raise ValueError('Invalid size: %r' % (value,))
+    number, unit = m.groups()
+    return int(float(number) * _size_units[unit.lower()])
+
+
+_duration_re = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s)?\s*$', re.I)
+
+
+def parse_duration(value):
+    """Convert a duration like ``'200ms'``, ``'1.5s'`` or ``0.2`` to a
+    number of seconds."""
+    if isinstance(value, (int, float)):
+        return value
+    m = _duration_re.match(value)
+    if m is None:
+        raise ValueError('Invalid duration: %r' % (value,))
+    number, unit = m.groups()
+    if unit and unit.lower() == 'ms':
+        return float(number) / 1000
+    return float(number)
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024.
+    else:
+        unit = 'GB'
+    if unit == 'B':
+        return '%d %s' % (size, unit)
+    return '%.1f %s' % (size, unit)
+
+
+class MemoryReport:
+    """Memory allocated by the application while processing a request.
+    Available as ``res.memory`` when a ``max_memory`` budget is given.
+
+    .. attribute:: peak
+
+        The peak of memory allocated during the request, in bytes.
+
+    .. attribute:: retained
+
+        The lines which allocated the most memory still held at the end
+        of the request, as a list of :class:`tracemalloc.StatisticDiff`.
+        The memory allocated and released during the request counts in
+        the peak but is not listed. The lines of webtest, webob, the
+        import machinery and tracemalloc are left out.
+    """
+
+    def __init__(self, peak, retained):
+        self.peak = peak
+        self.retained = retained
+
+    def __str__(self):
+        lines = ['Peak memory: %s' % format_size(self.peak)]
+        if self.retained:
+            lines.append('Largest allocations still held at the end of the '
+                         'request:')
+            lines.extend('  %s' % stat for stat in self.retained)
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return '<MemoryReport peak=%s>' % format_size(self.peak)
+
+
+class MemoryTracker:
+    """Trace the memory allocated between :meth:`start` and :meth:`stop`
+    with :mod:`tracemalloc`."""
+
+    limit = 10
+
+    def start(self):
+        self.was_tracing = tracemalloc.is_tracing()
+        if not self.was_tracing:
+            tracemalloc.start()
+        self.before = tracemalloc.take_snapshot()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        if not self.was_tracing:
+            tracemalloc.stop()
+        filters = memory_filters()
+        stats = after.filter_traces(filters).compare_to(
+            self.before.filter_traces(filters), 'lineno')
+        retained = [stat for stat in stats if stat.size_diff > 0]
+        self.before = None
+        return MemoryReport(max(peak - self.baseline, 0),
+                            retained[:self.limit])
+
+
+def memory_filters():
+    """Return the :class:`tracemalloc.Filter` list excluding the
+    allocations done by webtest, webob, the import machinery and
+    tracemalloc from a :class:`MemoryReport`"""
+    patterns = ['<frozen *>', '<unknown>', tracemalloc.__file__]
+    for filename in (importlib.__file__, webob.__file__, __file__):
+        patterns.append(os.path.join(os.path.dirname(filename), '*'))
+    return [tracemalloc.Filter(False, pattern) for pattern in patterns]
+
+
+def format_timings(rows):
+    """Format ``(phase, calls, seconds)`` rows as a table"""
+    total = sum(seconds for phase, calls, seconds in rows) or 1
+    lines = ['%-16s %8s %12s %12s %7s' % (
+        'phase', 'calls', 'total (ms)', 'mean (ms)', '%')]
+    for phase, calls, seconds in rows:
+        lines.append('%-16s %8d %12.3f %12.3f %7.1f' % (
+            phase, calls, seconds * 1000, seconds * 1000 / calls,
+            seconds * 100 / total))
+    return '\n'.join(lines)
+
+
+class Timings:
+    """Cumulative time spent in each phase of the requests done by a
+    :class:`~webtest.app.TestApp`. Available as ``app.timings`` when the
+    ``TestApp`` is created with ``timings=True``.
+
+    Phases are recorded in the order they are first seen:
+
+    - ``environ``: building the request in ``get()``, ``post()``, etc.
+    - ``cookie_header``: adding the ``Cookie`` header
+    - ``lint``: the lint middleware, including the WSGI call machinery
+      around the application
+    - ``app``: calling the application
+    - ``app_iter``: consuming the application iterator
+    - ``decode_content``: decoding a compressed body
+    - ``cookie_extract``: merging the response cookies in the cookiejar
+    - ``html``, ``forms`` and ``json``: the lazy parsers of
+      :class:`~webtest.response.TestResponse`. ``forms`` does not include
+      the ``html`` parsing it relies on.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, seconds, calls=1):
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [calls, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+
+    def reset(self):
+        self.phases.clear()
+
+    @property
+    def durations(self):
+        """A dict of the total seconds spent in each phase"""
+        return {phase: seconds
+                for phase, (calls, seconds) in self.phases.items()}
+
+    def table(self):
+        """Return the timings formatted as a table"""
+        return format_timings([(phase, calls, seconds)
+                               for phase, (calls, seconds)
+                               in self.phases.items()])
+
+    __str__ = table
+
+
+class RequestTimer:
+    """Time spent in each phase of a single request. Available as
+    ``res.timings`` when the ``TestApp`` is created with ``timings=True``.
+    See :class:`Timings` for the list of phases."""
+
+    __slots__ = ('phases', 'calls', 'totals', 'started')
+
+    def __init__(self, totals=None):
+        self.phases = []
+        self.calls = {}
+        self.totals = totals
+        self.started = perf_counter()
+
+    def mark(self):
+        """Start timing a new phase"""
+        self.started = perf_counter()
+
+    def lap(self, phase, calls=1):
+        """Record ``phase`` as lasting from the last :meth:`mark` (or
+        :meth:`lap`) up to now"""
+        end = perf_counter()
+        self.add(phase, self.started, end, calls)
+        self.started = end
+
+    def add(self, phase, start, end=None, calls=1):
+        """Record a phase which lasted from ``start`` to ``end``. A phase
+        split in several parts is counted once by giving ``calls=0`` for
+        the other parts."""
+        if end is None:
+            end = perf_counter()
+        self.phases.append((phase, start, end))
+        self.calls[phase] = self.calls.get(phase, 0) + calls
+        if self.totals is not None:
+            self.totals.add(phase, end - start, calls)
+
+    @property
+    def durations(self):
+        """A dict of the seconds spent in each phase"""
+        durations = {}
+        for phase, start, end in self.phases:
+            durations[phase] = durations.get(phase, 0) + end - start
+        return durations
+
+    def table(self):
+        """Return the timings formatted as a table"""
+        durations = self.durations
+        return format_timings([(phase, self.calls[phase], seconds)
+                               for phase, seconds in durations.items()])
+
+    __str__ = table
+
+
+class AppTiming:
+    """The time spent in the application itself during a request, measured
+    by :class:`AppTimer`"""
+
+    __slots__ = ('call_start', 'call', 'iteration')
+
+    def __init__(self):
+        self.call_start = None
+        # seconds spent in the application call and its iterator
+        self.call = 0
+        self.iteration = 0
+
+
+class AppTimer:
+    """Wrap a WSGI application to measure the time spent in the application
+    alone when an :class:`AppTiming` is found in
+    ``environ['webtest.app_timing']``. The time spent in
+    ``start_response``, where the middlewares check the headers, is not
+    counted."""
+
+    __slots__ = ('application',)
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        timing = environ.get('webtest.app_timing')
+        if timing is None:
+            return self.application(environ, start_response)
+
+        def timed_start_response(*args):
+            start = perf_counter()
+            try:
+                return start_response(*args)
+            finally:
+                excluded[0] += perf_counter() - start
+
+        excluded = [0]
+        start = timing.call_start = perf_counter()
+        try:
+            app_iter = self.application(environ, timed_start_response)
+        finally:
+            timing.call = perf_counter() - start - excluded[0]
+        if isinstance(app_iter, (list, tuple)):
+            return app_iter
+        return TimedIterator(app_iter, timing, excluded)
+
+
+class TimedIterator:
+    """Count the time spent in the iterator of the application"""
+
+    __slots__ = ('app_iter', 'iterator', 'timing', 'excluded')
+
+    def __init__(self, app_iter, timing, excluded):
+        self.app_iter = app_iter
+        self.iterator = None
+        self.timing = timing
+        self.excluded = excluded
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        excluded = self.excluded[0]
+        start = perf_counter()
+        try:
+            if self.iterator is None:
+                self.iterator = iter(self.app_iter)
+            return next(self.iterator)
+        finally:
+            self.timing.iteration += (perf_counter() - start -
+                                      self.excluded[0] + excluded)
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            start = perf_counter()
+            try:
+                self.app_iter.close()
+            finally:
+                self.timing.iteration += perf_counter() - start
@@ -1,5 +1,7 @@
 import re
 
+from time import perf_counter
+
 from webtest import forms
 from webtest import utils
 from webtest.compat import print_stderr
@@ -68,12 +70,18 @@ class TestResponse(webob.Response):
 
     def _parse_forms(self):
         forms_ = self._forms_indexed = {}
-        form_texts = [str(f) for f in self.html('form')]
+        html = self.html
+        timer = getattr(self, 'timings', None)
+        if timer is not None:
+            start = perf_counter()
+        form_texts = [str(f) for f in html('form')]
         for i, text in enumerate(form_texts):
             form = forms.Form(self, text, self.parser_features)
             forms_[i] = form
             if form.id:
                 forms_[form.id] = form
+        if timer is not None:
+            timer.add('forms', start)
 
     def _follow(self, **kw):
         location = self.headers['location']
@@ -399,7 +407,12 @@ class TestResponse(webob.Response):
             raise AttributeError(
                 "Not an HTML response body (content-type: %s)"
                 % self.content_type)
+        timer = getattr(self, 'timings', None)
+        if timer is not None:
+            start = perf_counter()
         soup = BeautifulSoup(self.testbody, self.parser_features)
+        if timer is not None:
+            timer.add('html', start)
         return soup
 
     @property
@@ -483,7 +496,13 @@ class TestResponse(webob.Response):
             raise AttributeError(
                 "Not a JSON response body (content-type: %s)"
                 % self.content_type)
-        return self.json_body
+        timer = getattr(self, 'timings', None)
+        if timer is None:
+            return self.json_body
+        start = perf_counter()
+        json_body = self.json_body
+        timer.add('json', start)
+        return json_body
 
     @property
     def pyquery(self):
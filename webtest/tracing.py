@@ -0,0 +1,175 @@
+"""
+Export the requests done by a :class:`~webtest.app.TestApp` as
+`OpenTelemetry <https://opentelemetry.io/>`_ compatible spans, without
+requiring a collector.
+
+Each request produces a root span, with a child span for each phase of
+:meth:`~webtest.app.TestApp.do_request` (see
+:class:`webtest.perf.Timings`). A W3C ``traceparent`` header pointing to the
+``app`` span is added to the request so the spans of the application nest
+underneath. When linting, the ``app`` span only covers the application
+call: the work of the lint middleware is exported as ``lint`` spans. When
+the application raises, the ``app`` span ends with the exception and has an
+error status.
+
+Spans are dicts using the field names of the OTLP JSON encoding.
+"""
+
+import json
+import os
+import re
+import time
+
+from time import perf_counter
+
+
+__all__ = ['InMemoryExporter', 'JsonLinesExporter']
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+
+_traceparent_re = re.compile(
+    r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+def parse_traceparent(value):
+    """Return the ``(trace_id, parent_id)`` of a ``traceparent`` header or
+    None if it is invalid"""
+    m = _traceparent_re.match(value.strip().lower())
+    if m is None:
+        return None
+    return m.groups()
+
+
+def attributes(**values):
+    """Encode keyword arguments as OTLP attributes. Underscores in names are
+    replaced by dots."""
+    encoded = []
+    for key, value in sorted(values.items()):
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = {'boolValue': value}
+        elif isinstance(value, int):
+            value = {'intValue': str(value)}
+        else:
+            value = {'stringValue': str(value)}
+        encoded.append({'key': key.replace('_', '.'), 'value': value})
+    return encoded
+
+
+class RequestTrace:
+    """The trace context of a single request"""
+
+    def __init__(self, environ):
+        context = None
+        if environ.get('HTTP_TRACEPARENT'):
+            context = parse_traceparent(environ['HTTP_TRACEPARENT'])
+        if context is None:
+            self.trace_id, self.parent_id = new_trace_id(), None
+        else:
+            self.trace_id, self.parent_id = context
+        self.span_id = new_span_id()
+        self.app_span_id = new_span_id()
+        # the exception raised by the application, if any
+        self.app_exc = None
+        # used to convert perf_counter() values to unix time
+        self.offset = time.time() - perf_counter()
+
+    @property
+    def traceparent(self):
+        """The ``traceparent`` header passed to the application"""
+        return '00-%s-%s-01' % (self.trace_id, self.app_span_id)
+
+    def _nano(self, timestamp):
+        return str(int((timestamp + self.offset) * 1e9))
+
+    def _span(self, name, span_id, parent_id, start, end, kind,
+              attrs=(), status=None):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': span_id,
+            'name': name,
+            'kind': kind,
+            'startTimeUnixNano': self._nano(start),
+            'endTimeUnixNano': self._nano(end),
+            'attributes': list(attrs),
+            'status': status or {'code': STATUS_CODE_UNSET},
+        }
+        if parent_id:
+            span['parentSpanId'] = parent_id
+        return span
+
+    def spans(self, req, timer, res=None, exc=None):
+        """Return the spans of the request: a root span followed by a span
+        for each phase recorded by ``timer``"""
+        end = perf_counter()
+        phases = timer.phases
+        start = phases[0][1] if phases else timer.started
+        status = None
+        if exc is not None:
+            status = {'code': STATUS_CODE_ERROR, 'message': str(exc)}
+        root = self._span(
+            '%s %s' % (req.method, req.path_info or '/'),
+            self.span_id, self.parent_id, start, end, SPAN_KIND_CLIENT,
+            attributes(http_request_method=req.method,
+                       url_full=req.url,
+                       http_response_status_code=(
+                           res.status_int if res is not None else None),
+                       error_type=(
+                           type(exc).__name__ if exc is not None else None)),
+            status)
+        spans = [root]
+        for name, phase_start, phase_end in phases:
+            attrs = status = None
+            if name == 'app':
+                span_id = self.app_span_id
+                if self.app_exc is not None:
+                    attrs = attributes(
+                        exception_type=type(self.app_exc).__name__,
+                        exception_message=str(self.app_exc))
+                    status = {'code': STATUS_CODE_ERROR,
+                              'message': str(self.app_exc)}
+            else:
+                span_id = new_span_id()
+            spans.append(self._span(name, span_id, self.span_id,
+                                    phase_start, phase_end,
+                                    SPAN_KIND_INTERNAL, attrs or (), status))
+        return spans
+
+
+class InMemoryExporter:
+    """Keep the spans in memory, in the ``spans`` list"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+    def clear(self):
+        del self.spans[:]
+
+
+class JsonLinesExporter:
+    """Append the spans to the file at ``path``, one JSON object per
+    line"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, 'a') as fd:
+            for span in spans:
+                fd.write(json.dumps(span, sort_keys=True) + '\n')